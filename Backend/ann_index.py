@@ -0,0 +1,182 @@
+import json
+import logging
+import math
+import os
+import time
+
+import faiss
+import numpy as np
+
+# Vector index built for new topics: auto (picked from the chunk count), flat, hnsw, ivf_flat or ivf_pq
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "auto")
+
+# Chunk counts at which auto selection moves to the next index type. Below ANN_IVF_MIN_CHUNKS
+# exact search is fast enough; IVF-PQ trades some recall for 16x less memory on the largest
+# topics. HNSW is never picked automatically (IVF-Flat had better recall per millisecond in
+# benchmarks/bench_ann.py) but suits topics that mostly grow through appends, since IVF
+# centroids are not retrained when chunks are added.
+ANN_IVF_MIN_CHUNKS = int(os.getenv("ANN_IVF_MIN_CHUNKS", "20000"))
+ANN_IVF_PQ_MIN_CHUNKS = int(os.getenv("ANN_IVF_PQ_MIN_CHUNKS", "1000000"))
+
+# HNSW graph degree and build/search beam widths
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+ANN_HNSW_EF_CONSTRUCTION = int(os.getenv("ANN_HNSW_EF_CONSTRUCTION", "200"))
+ANN_HNSW_EF_SEARCH = int(os.getenv("ANN_HNSW_EF_SEARCH", "128"))
+
+# IVF-PQ code: sub-quantizers per vector and bits per sub-quantizer (96 x 8 bits = 96 bytes
+# per MiniLM vector instead of 1536)
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "96"))
+ANN_PQ_NBITS = int(os.getenv("ANN_PQ_NBITS", "8"))
+
+# Search-time overrides for every loaded topic; empty keeps the values saved with each index
+ANN_NPROBE = os.getenv("ANN_NPROBE", "")
+ANN_EF_SEARCH = os.getenv("ANN_EF_SEARCH", "")
+
+# Build parameters of a saved topic index, next to index.faiss
+INDEX_META_FILE = "index_meta.json"
+
+INDEX_TYPES = ["flat", "hnsw", "ivf_flat", "ivf_pq"]
+
+# k-means needs about this many training points per centroid to place them well
+_MIN_POINTS_PER_CENTROID = 39
+
+
+def choose_index_type(ntotal: int, index_type: str = ANN_INDEX_TYPE):
+    """
+    Resolve "auto" to an index type for a topic of `ntotal` chunks.
+    """
+    if index_type != "auto":
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown ANN index type '{index_type}' (expected auto or one of {INDEX_TYPES})")
+        return index_type
+    if ntotal >= ANN_IVF_PQ_MIN_CHUNKS:
+        return "ivf_pq"
+    if ntotal >= ANN_IVF_MIN_CHUNKS:
+        return "ivf_flat"
+    return "flat"
+
+
+def _nlist(ntotal: int):
+    # About 4*sqrt(n) lists, but never more than the training set can support
+    return max(1, min(int(4 * math.sqrt(ntotal)), ntotal // _MIN_POINTS_PER_CENTROID))
+
+
+def _pq_m(dimension: int):
+    # Largest sub-quantizer count <= ANN_PQ_M that divides the dimension
+    return next(m for m in range(min(ANN_PQ_M, dimension), 0, -1) if dimension % m == 0)
+
+
+def build_ann_index(vectors, index_type: str = ANN_INDEX_TYPE):
+    """
+    Build and fill a FAISS index for `vectors` (float32, one row per chunk). Returns
+    (index, meta) where meta records the type, build parameters and search parameters.
+    L2 distance throughout, like LangChain's default flat index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    ntotal, dimension = vectors.shape
+    index_type = choose_index_type(ntotal, index_type)
+    if index_type in ("ivf_flat", "ivf_pq"):
+        min_train = _MIN_POINTS_PER_CENTROID * (2 ** ANN_PQ_NBITS if index_type == "ivf_pq" else 1)
+        if ntotal < min_train:
+            logging.warning(f"{ntotal} chunks are too few to train {index_type}; building a flat index instead")
+            index_type = "flat"
+
+    start = time.perf_counter()
+    train_seconds = 0.0
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, ANN_HNSW_M)
+        index.hnsw.efConstruction = ANN_HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = ANN_HNSW_EF_SEARCH
+    else:
+        nlist = _nlist(ntotal)
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_m(dimension), ANN_PQ_NBITS)
+        index.nprobe = min(nlist, max(8, nlist // 16))
+        train_start = time.perf_counter()
+        index.train(vectors)
+        train_seconds = time.perf_counter() - train_start
+        # Keeps reconstruct() working (LangChain's MMR search uses it)
+        index.make_direct_map()
+    index.add(vectors)
+
+    meta = describe_index(index)
+    meta["build_seconds"] = round(time.perf_counter() - start, 3)
+    meta["train_seconds"] = round(train_seconds, 3)
+    # k-means subsamples to max_points_per_centroid (256) points per list
+    meta["train_points"] = min(ntotal, 256 * index.nlist) if index_type in ("ivf_flat", "ivf_pq") else 0
+    logging.info(f"Built {index_type} index over {ntotal} chunks in {meta['build_seconds']:.2f}s")
+    return index, meta
+
+
+def describe_index(index):
+    """
+    Type, structure and search parameters of a FAISS index, as saved in index_meta.json.
+    """
+    index = faiss.downcast_index(index)
+    meta = {"index_type": "flat", "metric": "l2", "dimension": index.d, "ntotal": index.ntotal, "params": {}, "search_params": {}}
+    if isinstance(index, faiss.IndexHNSW):
+        meta["index_type"] = "hnsw"
+        meta["params"] = {"M": index.hnsw.nb_neighbors(1), "efConstruction": index.hnsw.efConstruction}
+        meta["search_params"] = {"efSearch": index.hnsw.efSearch}
+    elif isinstance(index, faiss.IndexIVF):
+        meta["params"] = {"nlist": index.nlist}
+        if isinstance(index, faiss.IndexIVFPQ):
+            meta["index_type"] = "ivf_pq"
+            meta["params"].update({"m": index.pq.M, "nbits": index.pq.nbits})
+        else:
+            meta["index_type"] = "ivf_flat"
+        meta["search_params"] = {"nprobe": index.nprobe}
+    return meta
+
+
+def apply_search_params(index, meta=None):
+    """
+    Set nprobe / efSearch on a loaded index from its saved meta, then from the
+    ANN_NPROBE / ANN_EF_SEARCH overrides.
+    """
+    params = dict((meta or {}).get("search_params", {}))
+    if ANN_NPROBE:
+        params["nprobe"] = int(ANN_NPROBE)
+    if ANN_EF_SEARCH:
+        params["efSearch"] = int(ANN_EF_SEARCH)
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF) and "nprobe" in params:
+        index.nprobe = min(index.nlist, params["nprobe"])
+    elif isinstance(index, faiss.IndexHNSW) and "efSearch" in params:
+        index.hnsw.efSearch = params["efSearch"]
+
+
+def index_memory_bytes(index):
+    """
+    Approximate heap size of a FAISS index: stored codes and ids, graph links and centroids.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        storage = faiss.downcast_index(index.storage)
+        # Level 0 keeps 2*M neighbour ids per vector; upper levels add a few percent
+        return index.ntotal * (storage.code_size + index.hnsw.nb_neighbors(0) * 4)
+    if isinstance(index, faiss.IndexIVF):
+        direct_map = index.ntotal * 8 if index.direct_map.type != faiss.DirectMap.NoMap else 0
+        return index.ntotal * (index.code_size + 8) + index.nlist * index.d * 4 + direct_map
+    return index.ntotal * getattr(index, "code_size", index.d * 4)
+
+
+def write_index_meta(out_dir: str, meta: dict):
+    with open(os.path.join(out_dir, INDEX_META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_index_meta(local_dir: str):
+    """
+    Return the saved index meta, or None for topics built before index types existed (flat).
+    """
+    path = os.path.join(local_dir, INDEX_META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,108 @@
+"""
+Compare the topic index types (flat, HNSW, IVF-Flat, IVF-PQ): build time, single-query
+latency, memory and recall@k against exact search.
+
+Vectors are synthetic clusters shaped like MiniLM embeddings, or the vectors of a saved
+flat topic index.
+
+Example:
+    python benchmarks/bench_ann.py --sizes 20000,200000
+    python benchmarks/bench_ann.py --topic-dir /tmp/prepiq/topics/biology/v00003 --types hnsw,ivf_flat
+    python benchmarks/bench_ann.py --sizes 100000 --types ivf_flat --nprobe 8,16,32,64
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import INDEX_TYPES, apply_search_params, build_ann_index, index_memory_bytes
+from chunk_store import INDEX_FILE
+
+
+def synthetic_vectors(count, dimension=384, clusters=200, seed=0):
+    # Topic chunks cluster by section, so uniform random vectors would flatter IVF/PQ recall
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype("float32")
+    vectors = centers[rng.integers(0, clusters, count)] + 0.35 * rng.standard_normal((count, dimension)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def topic_vectors(topic_dir):
+    index = faiss.read_index(os.path.join(topic_dir, INDEX_FILE))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def queries_near(vectors, count, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), count)] + 0.2 * rng.standard_normal((count, vectors.shape[1])).astype("float32")
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def measure(index, queries, truth, k):
+    # One query per call, as LangChain's similarity_search issues them
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    recall = statistics.mean(len(set(f) & set(t)) / k for f, t in zip(found, truth))
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "recall": recall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="20000,100000", help="comma-separated chunk counts for synthetic vectors")
+    parser.add_argument("--topic-dir", help="use the vectors of a saved topic index instead")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", default="", help="comma-separated nprobe values to sweep for IVF indexes")
+    parser.add_argument("--ef-search", default="", help="comma-separated efSearch values to sweep for HNSW")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (the API searches from many threads)")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    datasets = [topic_vectors(args.topic_dir)] if args.topic_dir else [synthetic_vectors(int(n)) for n in args.sizes.split(",")]
+    for vectors in datasets:
+        queries = queries_near(vectors, args.queries)
+        exact = faiss.IndexFlatL2(vectors.shape[1])
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.k)
+        print(f"\n{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, recall@{args.k} vs exact search")
+        print(f"{'type':9} {'params':36} {'build s':>8} {'train s':>8} {'memory MB':>10} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+
+        for index_type in args.types.split(","):
+            index, meta = build_ann_index(vectors, index_type)
+            memory = index_memory_bytes(index) / 1e6
+            sweep = [None]
+            if meta["index_type"] in ("ivf_flat", "ivf_pq") and args.nprobe:
+                sweep = [{"nprobe": int(n)} for n in args.nprobe.split(",")]
+            elif meta["index_type"] == "hnsw" and args.ef_search:
+                sweep = [{"efSearch": int(n)} for n in args.ef_search.split(",")]
+            for search_params in sweep:
+                apply_search_params(index, {"search_params": search_params or meta["search_params"]})
+                result = measure(index, queries, truth, args.k)
+                params = ",".join(f"{key}={value}" for key, value in {**meta["params"], **(search_params or meta["search_params"])}.items())
+                print(
+                    f"{meta['index_type']:9} {params or '-':36} {meta['build_seconds']:8.2f} {meta['train_seconds']:8.2f}"
+                    f" {memory:10.1f} {result['p50_ms']:8.3f} {result['p95_ms']:8.3f} {result['recall']:7.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare RecursiveCharacterTextSplitter with the offset-based TextChunker: throughput and
+whether both produce exactly the same chunk boundaries.
+
+Example:
+    python benchmarks/bench_chunker.py --pages 2000
+    python benchmarks/bench_chunker.py --pdf notes.pdf --pdf slides.pdf --tokens
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from text_chunker import TextChunker
+
+SENTENCES = [
+    "Normalization organizes relational tables to reduce redundancy.",
+    "The TCP three-way handshake establishes a connection using SYN, SYN-ACK and ACK segments.",
+    "Dijkstra's algorithm computes shortest paths from a single source with non-negative weights.",
+    "A B-tree keeps keys sorted and allows searches, insertions and deletions in logarithmic time.",
+    "https://example.edu/courses/cs" + "x" * 600,
+]
+
+
+def synthetic_pages(pages, seed=0):
+    rng = random.Random(seed)
+    documents = []
+    for page in range(pages):
+        paragraphs = []
+        for _ in range(rng.randint(2, 8)):
+            lines = [" ".join(rng.choice(SENTENCES[:-1]) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 6))]
+            if rng.random() < 0.05:
+                lines.append(SENTENCES[-1])
+            paragraphs.append("\n".join(lines))
+        documents.append(Document(page_content="\n\n".join(paragraphs), metadata={"source": "synthetic.pdf", "page": page}))
+    return documents
+
+
+def time_split(splitter, documents, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = splitter.split_documents(documents)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return chunks, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=2000, help="synthetic pages when no --pdf is given")
+    parser.add_argument("--pdf", action="append", default=[], help="PDF to use as the corpus (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tokens", action="store_true", help="also time the token-aware mode")
+    args = parser.parse_args()
+
+    if args.pdf:
+        from pdf_extract import extract_documents
+        documents = list(extract_documents(args.pdf))
+    else:
+        documents = synthetic_pages(args.pages)
+    megabytes = sum(len(d.page_content) for d in documents) / 1e6
+    print(f"corpus: {len(documents)} pages, {megabytes:.1f}M characters")
+
+    baseline, baseline_seconds = time_split(
+        RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap), documents, args.repeat,
+    )
+    chunked, chunker_seconds = time_split(
+        TextChunker(args.chunk_size, args.chunk_overlap, length_unit="chars"), documents, args.repeat,
+    )
+    print(f"RecursiveCharacterTextSplitter: {baseline_seconds:.3f}s ({megabytes / baseline_seconds:.1f}M chars/s, {len(baseline)} chunks)")
+    print(f"TextChunker:                    {chunker_seconds:.3f}s ({megabytes / chunker_seconds:.1f}M chars/s, {len(chunked)} chunks)")
+    print(f"speedup: {baseline_seconds / chunker_seconds:.2f}x")
+
+    mismatches = [
+        i for i, (a, b) in enumerate(zip(baseline, chunked))
+        if a.page_content != b.page_content or a.metadata != b.metadata
+    ]
+    same = not mismatches and len(baseline) == len(chunked)
+    print(f"identical chunks and metadata: {same}")
+    if mismatches:
+        print(f"first mismatch at chunk {mismatches[0]} of {len(mismatches)}")
+
+    if args.tokens:
+        tokens, token_seconds = time_split(
+            TextChunker(args.chunk_size, args.chunk_overlap, length_unit="tokens"), documents, args.repeat,
+        )
+        print(f"TextChunker (tokens):           {token_seconds:.3f}s ({len(tokens)} chunks of at most {args.chunk_size} tokens)")
+
+
+if __name__ == "__main__":
+    main()
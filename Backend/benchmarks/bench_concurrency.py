@@ -0,0 +1,66 @@
+"""
+Measure endpoint throughput under concurrent load against a running backend.
+
+Example:
+    python benchmarks/bench_concurrency.py --endpoint /explain-answer --requests 40 --concurrency 10
+"""
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_PAYLOADS = {
+    "/explain-answer": {
+        "question": "Which gas is most abundant in Earth's atmosphere?",
+        "answer": "Nitrogen",
+        "choices": ["Oxygen", "Hydrogen", "Nitrogen", "Carbon Dioxide"],
+    },
+    "/grade-open-answer": {
+        "question": "What is the main function of red blood cells?",
+        "expected_answer": "They transport oxygen from the lungs to the rest of the body.",
+        "user_answer": "They carry oxygen around the body.",
+        "answer_type": "short_answer",
+    },
+}
+
+
+def send(url, payload):
+    start = time.perf_counter()
+    response = requests.post(url, json=payload, timeout=300)
+    return response.status_code, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/explain-answer")
+    parser.add_argument("--payload", help="JSON file with the request body")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload) as f:
+            payload = json.load(f)
+    else:
+        payload = DEFAULT_PAYLOADS[args.endpoint]
+    url = args.base_url.rstrip("/") + args.endpoint
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: send(url, payload), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    failures = sum(1 for status, _ in results if status != 200)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {failures} failed")
+    print(f"throughput: {args.requests / elapsed:.2f} req/s over {elapsed:.2f}s")
+    print(f"latency p50: {statistics.median(latencies):.2f}s  "
+          f"p95: {latencies[int(0.95 * (len(latencies) - 1))]:.2f}s  max: {latencies[-1]:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare sequential PyPDFLoader extraction with the process-pool extractor on a synthetic corpus.
+
+Example:
+    python benchmarks/bench_pdf_extract.py --files 4 --pages 150 --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.document_loaders import PyPDFLoader
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+LOREM = (
+    "Normalization organizes relational tables to reduce redundancy. The TCP three-way handshake "
+    "establishes a connection using SYN, SYN-ACK and ACK segments. Dijkstra's algorithm computes "
+    "shortest paths from a single source in graphs with non-negative edge weights. "
+)
+
+
+def make_pdf(path, pages):
+    pdf = canvas.Canvas(path, pagesize=letter)
+    for page in range(pages):
+        text = pdf.beginText(40, 740)
+        for line in range(45):
+            text.textLine(f"[{page}:{line}] " + LOREM[(line * 7) % 60:(line * 7) % 60 + 90])
+        pdf.drawText(text)
+        pdf.showPage()
+    pdf.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=150, help="pages per file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--pages-per-task", type=int, default=25)
+    args = parser.parse_args()
+
+    os.environ["PDF_EXTRACT_WORKERS"] = str(args.workers)
+    import pdf_extract
+
+    with tempfile.TemporaryDirectory() as corpus:
+        paths = [os.path.join(corpus, f"course-{i}.pdf") for i in range(args.files)]
+        for path in paths:
+            make_pdf(path, args.pages)
+        print(f"corpus: {args.files} files x {args.pages} pages")
+
+        start = time.perf_counter()
+        sequential = [doc for path in paths for doc in PyPDFLoader(path).load()]
+        sequential_seconds = time.perf_counter() - start
+
+        # Warm the pool so process start-up is not counted against a single run
+        list(pdf_extract.extract_documents(paths[:1]))
+        start = time.perf_counter()
+        submitted = [pdf_extract.submit_pdf(path, args.pages_per_task) for path in paths]
+        parallel = list(pdf_extract.iter_documents(submitted))
+        parallel_seconds = time.perf_counter() - start
+
+        same = [d.page_content for d in sequential] == [d.page_content for d in parallel]
+        print(f"sequential PyPDFLoader: {sequential_seconds:.2f}s ({len(sequential)} pages)")
+        print(f"process pool ({args.workers} workers): {parallel_seconds:.2f}s ({len(parallel)} pages)")
+        print(f"speedup: {sequential_seconds / parallel_seconds:.2f}x, identical text and order: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+
+from langchain.docstore.base import Docstore
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.vectorstores import FAISS
+
+from ann_index import apply_search_params, describe_index, read_index_meta, write_index_meta
+from embedding_service import get_embedding_service
+from lexical_index import LEXICAL_INDEX_ENABLED, build_lexical_index, has_lexical_index, lexical_search
+
+# Files of a saved topic index. Chunk text and metadata live in a SQLite table keyed by
+# vector id; index.pkl is only read for topics saved before the chunk store existed.
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.sqlite"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+
+class IdentityIdMap(Mapping):
+    """
+    index_to_docstore_id for a chunk store: vector i is chunk i, so no dict is kept.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, i):
+        i = int(i)
+        if not 0 <= i < self.size:
+            raise KeyError(i)
+        return i
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+    def __len__(self):
+        return self.size
+
+
+class SQLiteDocstore(Docstore):
+    """
+    Read-only docstore over chunks.sqlite. Chunks are read one query at a time when a
+    search returns them, so opening a topic reads no chunk text at all.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Published topic versions never change, so SQLite can skip locking entirely
+        self._uri = Path(path).absolute().as_uri() + "?mode=ro&immutable=1"
+        self._local = threading.local()
+        self._has_lexical_index = None
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def search(self, search):
+        row = self._conn().execute("SELECT text, metadata FROM chunks WHERE id = ?", (int(search),)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def search_many(self, ids):
+        """
+        Fetch several chunks in one query, returned in the order of `ids`, with None for
+        ids missing from the store so results stay aligned with the vectors they came from.
+        """
+        ids = [int(i) if i is not None else None for i in ids]
+        wanted = [i for i in ids if i is not None]
+        if not wanted:
+            return [None] * len(ids)
+        placeholders = ",".join("?" * len(wanted))
+        rows = self._conn().execute(f"SELECT id, text, metadata FROM chunks WHERE id IN ({placeholders})", wanted)
+        found = {row[0]: Document(page_content=row[1], metadata=json.loads(row[2])) for row in rows}
+        return [found.get(i) for i in ids]
+
+    def lexical_search(self, text: str, k: int):
+        """
+        Chunk ids ranked by BM25 for `text`; empty for topics saved without a lexical index.
+        """
+        if self._has_lexical_index is None:
+            self._has_lexical_index = has_lexical_index(self._conn())
+        if not self._has_lexical_index:
+            return []
+        return lexical_search(self._conn(), text, k)
+
+    def all_documents(self):
+        rows = self._conn().execute("SELECT text, metadata FROM chunks ORDER BY id")
+        return [Document(page_content=text, metadata=json.loads(metadata)) for text, metadata in rows]
+
+
+def read_faiss_index(path: str, mmap: bool = True):
+    """
+    Read an index.faiss file memory-mapped and read-only when possible, otherwise into
+    the heap. Flat indexes need FAISS >= 1.10 (IO_FLAG_MMAP_IFC); older builds only map
+    IVF inverted lists. Returns (index, mmapped).
+    """
+    import faiss
+
+    if mmap:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(path, flags), True
+        except RuntimeError as e:
+            logging.warning(f"Could not memory-map {path} ({e}); reading it into memory")
+    return faiss.read_index(path), False
+
+
+def save_topic_store(faiss_index, out_dir: str, index_meta: dict = None):
+    """
+    Write a LangChain FAISS store as index.faiss plus chunks.sqlite (instead of save_local's index.pkl),
+    and index_meta.json with the index type and parameters (build details taken from `index_meta`).
+    chunks.sqlite also gets the BM25 inverted index used by hybrid retrieval.
+    """
+    import faiss
+
+    os.makedirs(out_dir, exist_ok=True)
+    faiss.write_index(faiss_index.index, os.path.join(out_dir, INDEX_FILE))
+    write_index_meta(out_dir, {**(index_meta or {}), **describe_index(faiss_index.index)})
+
+    chunks_path = os.path.join(out_dir, CHUNKS_FILE)
+    if os.path.exists(chunks_path):
+        os.remove(chunks_path)
+    conn = sqlite3.connect(chunks_path)
+    try:
+        conn.execute("CREATE TABLE chunks (id INTEGER PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)")
+        rows = (
+            (i, doc.page_content, json.dumps(doc.metadata, default=str))
+            for i, doc in (
+                (i, faiss_index.docstore.search(faiss_index.index_to_docstore_id[i]))
+                for i in range(faiss_index.index.ntotal)
+            )
+        )
+        conn.executemany("INSERT INTO chunks (id, text, metadata) VALUES (?, ?, ?)", rows)
+        if LEXICAL_INDEX_ENABLED:
+            build_lexical_index(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_topic_store(local_dir: str, mmap: bool = True, writable: bool = False):
+    """
+    Open a saved topic index as a LangChain FAISS store. Returns (store, mmapped).
+
+    By default the vectors are memory-mapped and chunks are read lazily from
+    chunks.sqlite. With writable=True everything is loaded into memory so documents can
+    be added. Topics saved with index.pkl are unpickled as before. Search parameters
+    (nprobe, efSearch) saved in index_meta.json are applied to the index.
+    """
+    index, mmapped = read_faiss_index(os.path.join(local_dir, INDEX_FILE), mmap and not writable)
+    apply_search_params(index, read_index_meta(local_dir))
+    chunks_path = os.path.join(local_dir, CHUNKS_FILE)
+    if os.path.exists(chunks_path):
+        chunk_store = SQLiteDocstore(chunks_path)
+        if writable:
+            documents = chunk_store.all_documents()
+            docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(documents)})
+            index_to_docstore_id = {i: str(i) for i in range(len(documents))}
+        else:
+            docstore, index_to_docstore_id = chunk_store, IdentityIdMap(index.ntotal)
+    else:
+        with open(os.path.join(local_dir, LEGACY_DOCSTORE_FILE), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(get_embedding_service(), index, docstore, index_to_docstore_id), mmapped
@@ -0,0 +1,160 @@
+import logging
+import os
+import threading
+from collections import deque
+
+import numpy as np
+
+from text_utils import estimate_tokens
+
+# Prompt tokens of retrieved context sent with a quiz generated in a single LLM call
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2500"))
+
+# Passages whose MiniLM cosine similarity to a more relevant passage is above this are dropped
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.95"))
+
+# Shortest shared text accepted as the chunker's overlap between two chunks of a page;
+# shorter matches could be coincidental phrases
+_MIN_OVERLAP_CHARS = 16
+
+_stats_lock = threading.Lock()
+_stats = {"packs": 0, "chunks": 0, "merged": 0, "duplicates": 0, "over_budget": 0, "tokens_before": 0, "tokens_after": 0}
+_recent = deque(maxlen=20)
+
+
+class Passage:
+    def __init__(self, text, rank, vectors, metadata):
+        self.text = text
+        self.rank = rank
+        self.vectors = vectors
+        self.metadata = metadata
+
+    @property
+    def vector(self):
+        mean = np.mean(self.vectors, axis=0)
+        return mean / max(float(np.linalg.norm(mean)), 1e-12)
+
+
+def overlap_length(first: str, second: str):
+    """
+    Length of the longest suffix of `first` that is a prefix of `second` (at least
+    _MIN_OVERLAP_CHARS long), or 0. Consecutive chunks of a page overlap like this.
+    """
+    head = second[:_MIN_OVERLAP_CHARS]
+    if len(head) < _MIN_OVERLAP_CHARS:
+        return 0
+    start = max(0, len(first) - len(second))
+    while True:
+        i = first.find(head, start)
+        if i == -1:
+            return 0
+        if second.startswith(first[i:]):
+            return len(first) - i
+        start = i + 1
+
+
+def merge_adjacent(passages):
+    """
+    Join passages of the same page whose text continues one another, dropping the repeated
+    overlap. A merged passage keeps the best relevance rank of its parts.
+    """
+    by_page = {}
+    for passage in passages:
+        key = (passage.metadata.get("source"), passage.metadata.get("page"))
+        by_page.setdefault(key, []).append(passage)
+
+    merged = []
+    for group in by_page.values():
+        changed = True
+        while changed and len(group) > 1:
+            changed = False
+            for a in group:
+                for b in group:
+                    if a is b:
+                        continue
+                    overlap = overlap_length(a.text, b.text)
+                    if overlap:
+                        joined = Passage(a.text + b.text[overlap:], min(a.rank, b.rank), a.vectors + b.vectors, a.metadata)
+                        group = [p for p in group if p is not a and p is not b] + [joined]
+                        changed = True
+                        break
+                if changed:
+                    break
+        merged.extend(group)
+    return sorted(merged, key=lambda p: p.rank)
+
+
+def drop_near_duplicates(passages, threshold=CONTEXT_DEDUP_THRESHOLD):
+    """
+    Keep passages in relevance order, skipping any too similar to one already kept.
+    """
+    kept, kept_vectors = [], []
+    for passage in passages:
+        vector = passage.vector
+        if kept_vectors and float(np.max(np.stack(kept_vectors) @ vector)) > threshold:
+            continue
+        kept.append(passage)
+        kept_vectors.append(vector)
+    return kept
+
+
+def fit_budget(texts, token_budget):
+    """
+    Take texts in order while they fit the token budget; smaller later texts may still fit
+    after a large one is skipped. The first text is truncated if it alone is too long.
+    """
+    packed, used = [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if used + tokens > token_budget:
+            continue
+        packed.append(text)
+        used += tokens
+    if not packed and texts:
+        packed = [texts[0][:token_budget * 4]]
+    return packed
+
+
+def pack_context(documents, vectors, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Turn retrieved chunks (in relevance order, with their embedding vectors) into the
+    passages sent to the LLM: overlapping chunks of a page are merged, near-duplicates are
+    dropped and passages are taken in relevance order until `token_budget` is used.
+    Returns (passages, report) with the context tokens before and after packing.
+    """
+    chunks = [
+        Passage(doc.page_content, rank, [np.asarray(vector, dtype="float32")], doc.metadata)
+        for rank, (doc, vector) in enumerate(zip(documents, vectors))
+    ]
+    merged = merge_adjacent(chunks)
+    unique = drop_near_duplicates(merged)
+    passages = fit_budget([p.text for p in unique], token_budget)
+
+    report = {
+        "chunks": len(chunks),
+        "merged": len(chunks) - len(merged),
+        "duplicates": len(merged) - len(unique),
+        "over_budget": len(unique) - len(passages),
+        "passages": len(passages),
+        "token_budget": token_budget,
+        "tokens_before": estimate_tokens("\n".join(doc.page_content for doc in documents)),
+        "tokens_after": estimate_tokens("\n".join(passages)),
+    }
+    with _stats_lock:
+        _stats["packs"] += 1
+        for name in ("chunks", "merged", "duplicates", "over_budget", "tokens_before", "tokens_after"):
+            _stats[name] += report[name]
+        _recent.append(report)
+    logging.info(f"Context packer: {report}")
+    return passages, report
+
+
+def context_packer_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+        recent = list(_recent)
+    stats["tokens_saved_fraction"] = (
+        1 - stats["tokens_after"] / stats["tokens_before"] if stats["tokens_before"] else None
+    )
+    stats["recent"] = recent
+    return stats
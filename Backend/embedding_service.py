@@ -0,0 +1,213 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from langchain.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+
+from embedding_store import EmbeddingStore
+from lru_cache import LRUCache
+from workspace import WORKSPACE_ROOT
+
+# Model used for every FAISS index in this project (ingestion, retrieval and grading)
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+
+# Number of texts encoded per call to the underlying model
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Persistent chunk embedding cache shared by all workers (set EMBEDDING_CACHE_ENABLED=0 to disable)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(WORKSPACE_ROOT, "embedding_cache"))
+
+# Query vectors kept in memory by query text; subtopic queries repeat across students (0 disables)
+QUERY_VECTOR_CACHE_SIZE = int(os.getenv("QUERY_VECTOR_CACHE_SIZE", "4096"))
+
+
+class EmbeddingService(Embeddings):
+    """
+    Process-wide wrapper around the MiniLM sentence-transformer.
+
+    The model is loaded once (normally during the FastAPI lifespan warm-up) and then
+    shared by every request thread. It implements the LangChain Embeddings interface so
+    it can be passed straight to FAISS.from_documents / FAISS.load_local.
+
+    embed_documents (the path FAISS uses for ingestion) goes through the persistent
+    embedding cache and only encodes chunks it has never seen; encode() always runs the
+    model and is used for short-lived texts such as student answers.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 cache_dir: str = EMBEDDING_CACHE_DIR if EMBEDDING_CACHE_ENABLED else None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.store = EmbeddingStore(cache_dir, model_name) if cache_dir else None
+        self.ingest_reports = deque(maxlen=20)
+        self.query_cache = LRUCache(QUERY_VECTOR_CACHE_SIZE)
+        self._model = None
+        self._load_lock = threading.Lock()
+        # The underlying torch model is not guaranteed to be re-entrant, so encodes are serialized
+        self._encode_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.load_seconds = None
+        self._stats = {
+            "document_batches": 0,
+            "documents_encoded": 0,
+            "document_seconds": 0.0,
+            "queries_encoded": 0,
+            "query_seconds": 0.0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "cache_saved_seconds": 0.0,
+        }
+
+    def load(self):
+        """
+        Load the model weights if they are not loaded yet. Safe to call from several threads.
+        """
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                start = time.perf_counter()
+                self._model = HuggingFaceEmbeddings(
+                    model_name=self.model_name,
+                    encode_kwargs={"batch_size": self.batch_size},
+                )
+                self.load_seconds = time.perf_counter() - start
+                logging.info(f"Embedding model {self.model_name} loaded in {self.load_seconds:.2f}s")
+        return self._model
+
+    @property
+    def is_loaded(self):
+        return self._model is not None
+
+    def encode(self, texts):
+        """
+        Encode a list of texts in batches of `batch_size`, bypassing the cache.
+        """
+        model = self.load()
+        texts = list(texts)
+        if not texts:
+            return []
+        start = time.perf_counter()
+        with self._encode_lock:
+            vectors = model.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self._stats["document_batches"] += 1
+            self._stats["documents_encoded"] += len(texts)
+            self._stats["document_seconds"] += elapsed
+        logging.info(f"Encoded {len(texts)} texts in {elapsed:.3f}s")
+        return vectors
+
+    def embed_documents(self, texts):
+        """
+        Embed chunks, reusing cached vectors and encoding only cache misses.
+        """
+        texts = list(texts)
+        if self.store is None or not texts:
+            return self.encode(texts)
+
+        keys = [self.store.key(text) for text in texts]
+        cached = self.store.lookup(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        encode_seconds = 0.0
+        if missing:
+            start = time.perf_counter()
+            new_vectors = self.encode(list(missing.values()))
+            encode_seconds = time.perf_counter() - start
+            self.store.add(list(missing.keys()), new_vectors)
+            cached.update(zip(missing.keys(), new_vectors))
+
+        hits = len(texts) - len(missing)
+        with self._stats_lock:
+            # Saved time is estimated from the average encode cost per text seen so far
+            per_text = (
+                self._stats["document_seconds"] / self._stats["documents_encoded"]
+                if self._stats["documents_encoded"] else 0.0
+            )
+            self._stats["cache_hits"] += hits
+            self._stats["cache_misses"] += len(missing)
+            self._stats["cache_saved_seconds"] += hits * per_text
+        report = {
+            "texts": len(texts),
+            "cache_hits": hits,
+            "encoded": len(missing),
+            "hit_rate": hits / len(texts),
+            "encode_seconds": round(encode_seconds, 3),
+            "saved_seconds_estimate": round(hits * per_text, 3),
+        }
+        self.ingest_reports.append(report)
+        logging.info(f"Embedding cache: {report}")
+        return [list(map(float, cached[key])) for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts):
+        """
+        Embed search queries, encoding the ones not in the query cache in one model call.
+        """
+        texts = list(texts)
+        vectors = {}
+        for text in texts:
+            vector = self.query_cache.get(text)
+            if vector is not None:
+                vectors[text] = vector
+        missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+        if missing:
+            model = self.load()
+            start = time.perf_counter()
+            with self._encode_lock:
+                new_vectors = model.embed_documents(missing)
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self._stats["queries_encoded"] += len(missing)
+                self._stats["query_seconds"] += elapsed
+            for text, vector in zip(missing, new_vectors):
+                self.query_cache.put(text, vector)
+                vectors[text] = vector
+        return [list(vectors[text]) for text in texts]
+
+    def stats(self):
+        """
+        Return load time and cumulative encode timings.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["recent_ingests"] = list(self.ingest_reports)
+        stats["query_cache"] = self.query_cache.stats()
+        stats["model_name"] = self.model_name
+        stats["loaded"] = self.is_loaded
+        stats["load_seconds"] = self.load_seconds
+        stats["ms_per_document"] = (
+            1000 * stats["document_seconds"] / stats["documents_encoded"]
+            if stats["documents_encoded"] else None
+        )
+        stats["ms_per_query"] = (
+            1000 * stats["query_seconds"] / stats["queries_encoded"]
+            if stats["queries_encoded"] else None
+        )
+        return stats
+
+
+_embedding_service = None
+_embedding_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    """
+    Return the shared EmbeddingService, creating it on first use.
+    """
+    global _embedding_service
+    if _embedding_service is None:
+        with _embedding_service_lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService()
+    return _embedding_service
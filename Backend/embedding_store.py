@@ -0,0 +1,135 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+
+class EmbeddingStore:
+    """
+    On-disk embedding cache shared by every worker on the host.
+
+    Vectors are appended to a float32 matrix file that is read through a memory map;
+    a SQLite table maps sha256(model name, chunk text) to the vector's row. Appends are
+    serialized across processes with a file lock; lookups never take it.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        self.model_name = model_name
+        self.directory = os.path.join(directory, hashlib.sha256(model_name.encode()).hexdigest()[:16])
+        os.makedirs(self.directory, exist_ok=True)
+        self.db_path = os.path.join(self.directory, "keys.sqlite")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.lock_path = os.path.join(self.directory, "append.lock")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._matrix = None
+        self.dim = None
+
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.commit()
+        row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if row:
+            self.dim = int(row[0])
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def key(self, text: str):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _rows_on_disk(self):
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dim * 4)
+
+    def _matrix_with(self, max_row: int):
+        with self._lock:
+            if self._matrix is None or max_row >= self._matrix.shape[0]:
+                rows = self._rows_on_disk()
+                self._matrix = np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(rows, self.dim))
+            return self._matrix
+
+    def lookup(self, keys):
+        """
+        Return {key: vector} for the keys already in the cache.
+        """
+        conn = self._conn()
+        if self.dim is None:
+            # Another worker may have created the matrix since this store was opened
+            row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+            self.dim = int(row[0]) if row else None
+        if not keys or not self.dim:
+            return {}
+        rows = {}
+        unique = list(set(keys))
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for key, row in conn.execute(f"SELECT key, row FROM embeddings WHERE key IN ({placeholders})", batch):
+                rows[key] = row
+        if not rows:
+            return {}
+        matrix = self._matrix_with(max(rows.values()))
+        return {key: np.array(matrix[row]) for key, row in rows.items()}
+
+    def add(self, keys, vectors):
+        """
+        Append vectors for keys that are not cached yet.
+        """
+        vectors = np.asarray(vectors, dtype="float32")
+        if not len(keys):
+            return
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dim is None:
+                    self.dim = vectors.shape[1]
+                    conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (str(self.dim),))
+                seen = set()
+                for start in range(0, len(keys), 500):
+                    batch = list(keys[start:start + 500])
+                    placeholders = ",".join("?" * len(batch))
+                    seen.update(k for (k,) in conn.execute(f"SELECT key FROM embeddings WHERE key IN ({placeholders})", batch))
+                new = []
+                for i, key in enumerate(keys):
+                    if key not in seen:
+                        seen.add(key)
+                        new.append((i, key))
+                if new:
+                    first_row = self._rows_on_disk()
+                    with open(self.vectors_path, "ab") as f:
+                        # A write that failed partway leaves a partial trailing row; cut it
+                        # off so the new rows start where the key table expects them
+                        f.truncate(first_row * self.dim * 4)
+                        f.write(vectors[[i for i, _ in new]].tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                    # Rows are only recorded once their bytes are on disk
+                    conn.executemany(
+                        "INSERT INTO embeddings (key, row) VALUES (?, ?)",
+                        [(key, first_row + n) for n, (_, key) in enumerate(new)],
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,137 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from sqlalchemy import create_engine, Column, Integer, String, JSON, TIMESTAMP
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from llm_client import LLM_MODEL_NAME
+from quiz_generation import QUIZ_PROMPT_VERSION
+
+# Kept in its own SQLite file next to quiz_database.db so cache writes never contend with quiz writes
+GENERATION_CACHE_URL = os.getenv("GENERATION_CACHE_URL", "sqlite:///./generation_cache.db")
+
+# How long a generated quiz can be served again
+GENERATION_CACHE_TTL_SECONDS = int(os.getenv("GENERATION_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Maximum number of cached generations; least recently used ones are evicted first
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1000"))
+
+Base = declarative_base()
+
+
+class GenerationCacheEntry(Base):
+    __tablename__ = 'generation_cache'
+    cache_key = Column(String(64), primary_key=True)
+    topic_name = Column(String(255), nullable=False)
+    created_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+    last_accessed_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+    hits = Column(Integer, default=0)
+    quiz_data = Column(JSON, nullable=False)
+
+
+engine = create_engine(GENERATION_CACHE_URL, connect_args={"check_same_thread": False})
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+
+
+def _count(name, delta=1):
+    with _stats_lock:
+        _stats[name] += delta
+
+
+def generation_cache_key(topic_name: str, subtopics: list, question_counts: dict, extra_info: str, context_texts: list):
+    """
+    Key a generation by everything that shapes the prompt: the request, a hash of the
+    retrieved context, the prompt template version and the model.
+    """
+    context_hash = hashlib.sha256("\x1e".join(context_texts).encode()).hexdigest()
+    payload = {
+        "topic_name": topic_name,
+        "subtopics": sorted(subtopics),
+        "question_counts": {k: v for k, v in sorted(question_counts.items()) if v},
+        "extra_info": extra_info or "",
+        "context_hash": context_hash,
+        "prompt_version": QUIZ_PROMPT_VERSION,
+        "model": LLM_MODEL_NAME,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def get_cached_generation(cache_key: str):
+    """
+    Return the cached quiz questions for a key, or None when missing or expired.
+    """
+    db = SessionLocal()
+    try:
+        entry = db.query(GenerationCacheEntry).filter(GenerationCacheEntry.cache_key == cache_key).first()
+        now = datetime.datetime.utcnow()
+        if entry is None or (now - entry.created_at).total_seconds() > GENERATION_CACHE_TTL_SECONDS:
+            _count("misses")
+            return None
+        entry.last_accessed_at = now
+        entry.hits = (entry.hits or 0) + 1
+        db.commit()
+        _count("hits")
+        return entry.quiz_data
+    finally:
+        db.close()
+
+
+def store_generation(cache_key: str, topic_name: str, quiz_questions: list):
+    """
+    Store a generated quiz and evict expired and least recently used entries.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.datetime.utcnow()
+        entry = db.query(GenerationCacheEntry).filter(GenerationCacheEntry.cache_key == cache_key).first()
+        if entry is None:
+            entry = GenerationCacheEntry(cache_key=cache_key, topic_name=topic_name, hits=0)
+            db.add(entry)
+        entry.quiz_data = quiz_questions
+        entry.created_at = now
+        entry.last_accessed_at = now
+        db.flush()
+
+        expired_before = now - datetime.timedelta(seconds=GENERATION_CACHE_TTL_SECONDS)
+        evicted = db.query(GenerationCacheEntry).filter(GenerationCacheEntry.created_at < expired_before).delete()
+        db.flush()
+
+        overflow = db.query(GenerationCacheEntry).count() - GENERATION_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            oldest = (
+                db.query(GenerationCacheEntry.cache_key)
+                .order_by(GenerationCacheEntry.last_accessed_at)
+                .limit(overflow)
+                .all()
+            )
+            keys = [row.cache_key for row in oldest]
+            evicted += db.query(GenerationCacheEntry).filter(GenerationCacheEntry.cache_key.in_(keys)).delete(synchronize_session=False)
+        db.commit()
+        _count("stores")
+        _count("evictions", evicted)
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Failed to store generation in cache: {e}")
+    finally:
+        db.close()
+
+
+def note_bypassed():
+    _count("bypassed")
+
+
+def generation_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+    return stats
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from embedding_service import get_embedding_service
+from llm_client import ainvoke_llm, run_blocking
+from text_utils import estimate_tokens
+
+GRADING_SYSTEM_PROMPT = "You are a soft, student-friendly grader."
+
+GRADING_INSTRUCTIONS = (
+    "You are a kind and fair educational assistant tasked with grading open-ended quiz answers.\n\n"
+    "Your goal is to assess how well a student's answer matches the expected answer — in meaning, coverage, and relevance — without penalizing for grammar, length, or phrasing differences.\n\n"
+    "Provide two things:\n"
+    "- A score between 0.0 and 1.0 (float, to one decimal place)\n"
+    "- A feedback string (one paragraph explaining why that score was given, what was good, and what could be improved)\n\n"
+)
+
+# Token limit for grading a single answer
+GRADING_MAX_TOKENS = 500
+
+# Prompt tokens allowed for the answers packed into one batch grading call
+GRADING_BATCH_INPUT_TOKENS = int(os.getenv("GRADING_BATCH_INPUT_TOKENS", "3000"))
+
+# Output tokens allowed for one batch grading call
+GRADING_BATCH_MAX_TOKENS = int(os.getenv("GRADING_BATCH_MAX_TOKENS", "2000"))
+
+# Output tokens reserved per graded answer (score plus one paragraph of feedback)
+GRADING_TOKENS_PER_ITEM = 150
+
+
+# Answers at least this similar to the expected answer are graded 1.0 without the LLM
+GRADING_HIGH_SIMILARITY = float(os.getenv("GRADING_HIGH_SIMILARITY", "0.9"))
+
+# Answers at most this similar to the expected answer are graded 0.0 without the LLM
+GRADING_LOW_SIMILARITY = float(os.getenv("GRADING_LOW_SIMILARITY", "0.2"))
+
+_stats_lock = threading.Lock()
+_stats = {"answers": 0, "empty": 0, "similarity_high": 0, "similarity_low": 0, "sent_to_llm": 0}
+
+
+def _count(name, delta=1):
+    with _stats_lock:
+        _stats[name] += delta
+
+
+def grading_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    avoided = stats["empty"] + stats["similarity_high"] + stats["similarity_low"]
+    stats["llm_avoided_fraction"] = avoided / stats["answers"] if stats["answers"] else None
+    stats["high_similarity_threshold"] = GRADING_HIGH_SIMILARITY
+    stats["low_similarity_threshold"] = GRADING_LOW_SIMILARITY
+    return stats
+
+
+def pre_grade(items):
+    """
+    Grade clear-cut answers locally with MiniLM cosine similarity to the expected answer.
+
+    Returns one entry per item: a {score, feedback} result for empty, near-verbatim or
+    unrelated answers, and None for the ambiguous middle band that still needs the LLM.
+    """
+    results = [None] * len(items)
+    to_embed = []
+    for i, item in enumerate(items):
+        if not item.user_answer.strip():
+            results[i] = {"score": 0.0, "feedback": "No answer was given."}
+            _count("empty")
+        else:
+            to_embed.append(i)
+
+    if to_embed:
+        texts = []
+        for i in to_embed:
+            texts.extend([items[i].expected_answer, items[i].user_answer])
+        vectors = np.asarray(get_embedding_service().encode(texts), dtype="float32")
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        for n, i in enumerate(to_embed):
+            similarity = float(vectors[2 * n] @ vectors[2 * n + 1])
+            if similarity >= GRADING_HIGH_SIMILARITY:
+                results[i] = {
+                    "score": 1.0,
+                    "feedback": "Your answer closely matches the expected answer in meaning and coverage. Well done!",
+                }
+                _count("similarity_high")
+            elif similarity <= GRADING_LOW_SIMILARITY:
+                results[i] = {
+                    "score": 0.0,
+                    "feedback": f"Your answer does not address the question. The expected answer was: {items[i].expected_answer}",
+                }
+                _count("similarity_low")
+
+    _count("answers", len(items))
+    _count("sent_to_llm", sum(1 for r in results if r is None))
+    return results
+
+
+def build_grading_messages(item):
+    grading_prompt = (
+        GRADING_INSTRUCTIONS +
+        f"Question:\n{item.question}\n\n"
+        f"Expected Answer:\n{item.expected_answer}\n\n"
+        f"Student Answer:\n{item.user_answer}\n\n"
+        "Output STRICTLY in this format (JSON only):\n"
+        "{\n"
+        "  \"score\": float,\n"
+        "  \"feedback\": string\n"
+        "}"
+    )
+    return [
+        ("system", GRADING_SYSTEM_PROMPT),
+        ("user", grading_prompt)
+    ]
+
+
+def build_batch_grading_messages(items):
+    """
+    Build one prompt grading several answers, each tagged with its position in the batch.
+    """
+    answers = "".join(
+        f"### Answer {i}\n"
+        f"Question:\n{item.question}\n\n"
+        f"Expected Answer:\n{item.expected_answer}\n\n"
+        f"Student Answer:\n{item.user_answer}\n\n"
+        for i, item in enumerate(items)
+    )
+    grading_prompt = (
+        GRADING_INSTRUCTIONS +
+        "Grade EACH of the following answers independently.\n\n" +
+        answers +
+        "Output STRICTLY a JSON array with one object per answer (JSON only):\n"
+        "[\n"
+        "  {\"id\": int, \"score\": float, \"feedback\": string}\n"
+        "]"
+    )
+    return [
+        ("system", GRADING_SYSTEM_PROMPT),
+        ("user", grading_prompt)
+    ]
+
+
+def validate_grading_result(result):
+    if not isinstance(result, dict) or not {"score", "feedback"} <= result.keys():
+        raise ValueError("Missing keys in LLM grading response.")
+    return {"score": result["score"], "feedback": result["feedback"]}
+
+
+async def grade_answer(item):
+    """
+    Grade one answer, using the LLM only when the similarity pre-grader is not confident.
+    Raises json.JSONDecodeError or ValueError when the model output is unusable.
+    """
+    pre_graded = (await run_blocking(pre_grade, [item]))[0]
+    if pre_graded is not None:
+        return pre_graded
+    return await _llm_grade_answer(item)
+
+
+async def _llm_grade_answer(item):
+    response = await ainvoke_llm(build_grading_messages(item), max_tokens=GRADING_MAX_TOKENS)
+    print("Grading response:", response.content)
+    return validate_grading_result(json.loads(response.content))
+
+
+def pack_grading_batches(items):
+    """
+    Group item indexes into as few batches as the prompt and output token budgets allow.
+    """
+    batches = []
+    current, current_tokens = [], 0
+    max_items = max(1, GRADING_BATCH_MAX_TOKENS // GRADING_TOKENS_PER_ITEM)
+    for index, item in enumerate(items):
+        tokens = estimate_tokens(item.question + item.expected_answer + item.user_answer) + 20
+        if current and (current_tokens + tokens > GRADING_BATCH_INPUT_TOKENS or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _grade_batch(items, indexes):
+    """
+    Grade one packed batch. Returns {index: result} for the answers that parsed correctly.
+    """
+    batch_items = [items[i] for i in indexes]
+    max_tokens = min(GRADING_BATCH_MAX_TOKENS, 100 + GRADING_TOKENS_PER_ITEM * len(batch_items))
+    try:
+        response = await ainvoke_llm(build_batch_grading_messages(batch_items), max_tokens=max_tokens)
+        parsed = json.loads(response.content)
+        if not isinstance(parsed, list):
+            raise ValueError("Expected a list of grading results.")
+    except Exception as e:
+        logging.warning(f"Batch grading of {len(indexes)} answers failed: {e}")
+        return {}
+
+    results = {}
+    for entry in parsed:
+        try:
+            position = int(entry["id"])
+            if 0 <= position < len(indexes):
+                results[indexes[position]] = validate_grading_result(entry)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return results
+
+
+async def grade_answers(items):
+    """
+    Grade many answers with as few concurrent LLM calls as the token budget allows.
+    Clear-cut answers are settled by the similarity pre-grader first.
+    Answers whose result is missing or malformed are retried one at a time.
+    Results are returned in request order.
+    """
+    results = {}
+    if items:
+        for i, result in enumerate(await run_blocking(pre_grade, items)):
+            if result is not None:
+                results[i] = result
+
+    ambiguous = [i for i in range(len(items)) if i not in results]
+    batches = [[ambiguous[j] for j in batch] for batch in pack_grading_batches([items[i] for i in ambiguous])]
+    for batch_results in await asyncio.gather(*(_grade_batch(items, b) for b in batches)):
+        results.update(batch_results)
+
+    retry_indexes = [i for i in range(len(items)) if i not in results]
+    if retry_indexes:
+        logging.info(f"Retrying {len(retry_indexes)} of {len(items)} answers individually")
+        retried = await asyncio.gather(*(_llm_grade_answer(items[i]) for i in retry_indexes), return_exceptions=True)
+        for index, result in zip(retry_indexes, retried):
+            if isinstance(result, Exception):
+                results[index] = {"score": None, "feedback": None, "error": str(result)}
+            else:
+                results[index] = result
+
+    logging.info(
+        f"Graded {len(items)} answers: {len(items) - len(ambiguous)} by similarity, "
+        f"{len(batches)} batch calls and {len(retry_indexes)} retries"
+    )
+    return [results[i] for i in range(len(items))]
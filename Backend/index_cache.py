@@ -0,0 +1,292 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ann_index import index_memory_bytes
+from chunk_store import CHUNKS_FILE, INDEX_FILE, load_topic_store
+from topic_store import download_topic_index, get_s3_client, resolve_topic_index
+from workspace import acquire, release, topic_workspace
+
+# Memory budget for all cached topic indexes in one worker. Memory-mapped index files and
+# lazily read chunk stores count with their full file size.
+INDEX_CACHE_MAX_MB = int(os.getenv("INDEX_CACHE_MAX_MB", "512"))
+
+# Most topics cached at once, whatever their size. Every entry keeps SQLite connections
+# and a reference that stops its downloaded directory from being cleaned up.
+INDEX_CACHE_MAX_ENTRIES = int(os.getenv("INDEX_CACHE_MAX_ENTRIES", "64"))
+
+# How long a cached index is trusted before its S3 version is checked again.
+# Inside this window a cache hit touches neither disk nor network.
+INDEX_CACHE_REVALIDATE_SECONDS = float(os.getenv("INDEX_CACHE_REVALIDATE_SECONDS", "30"))
+
+# Open topic vectors with FAISS memory-mapped I/O, so every worker on the host shares the
+# page cache of the one downloaded copy instead of holding its own (set INDEX_MMAP=0 to disable)
+INDEX_MMAP = os.getenv("INDEX_MMAP", "1") == "1"
+
+# /proc/self/smaps counters reported for every mapped topic index
+_SMAPS_FIELDS = {
+    "Rss:": "rss_bytes",
+    "Pss:": "pss_bytes",
+    "Shared_Clean:": "shared_bytes",
+    "Shared_Dirty:": "shared_bytes",
+    "Private_Clean:": "private_bytes",
+    "Private_Dirty:": "private_bytes",
+}
+
+
+class CachedIndex:
+    def __init__(self, topic_name, version, faiss_index, size_bytes, local_dir=None, ref_token=None, mmapped=False):
+        self.topic_name = topic_name
+        self.version = version
+        self.faiss_index = faiss_index
+        self.size_bytes = size_bytes
+        self.local_dir = local_dir
+        self.ref_token = ref_token
+        self.mmapped = mmapped
+        self.checked_at = time.monotonic()
+        # Requests currently using the store, and whether the cache has dropped the entry
+        self.borrows = 0
+        self.retired = False
+
+    @property
+    def index_path(self):
+        return os.path.join(self.local_dir, INDEX_FILE) if self.local_dir else None
+
+    def retire(self):
+        self.retired = True
+        self._release_if_unused()
+
+    def give_back(self):
+        self.borrows -= 1
+        self._release_if_unused()
+
+    def _release_if_unused(self):
+        # Mapped and lazily read files must stay on disk while cached or borrowed; drop our
+        # reference once the entry is evicted and its last borrower is done
+        if self.retired and not self.borrows and self.ref_token:
+            release(self.local_dir, self.ref_token)
+            self.ref_token = None
+
+
+def mapped_file_usage(paths):
+    """
+    Per-file memory of this process's mappings of `paths`, summed from /proc/self/smaps.
+    Shared bytes are page-cache pages other workers can map too. Empty without /proc.
+    """
+    wanted = {os.path.realpath(p): p for p in paths}
+    usage = {}
+    try:
+        smaps = open("/proc/self/smaps")
+    except OSError:
+        return usage
+    current = None
+    with smaps:
+        for line in smaps:
+            fields = line.split()
+            if not fields:
+                continue
+            if not fields[0].endswith(":"):
+                # Mapping header: address perms offset dev inode [path]
+                current = wanted.get(" ".join(fields[5:])) if len(fields) > 5 else None
+                if current is not None and current not in usage:
+                    usage[current] = {name: 0 for name in set(_SMAPS_FIELDS.values())}
+                continue
+            name = _SMAPS_FIELDS.get(fields[0])
+            if current is not None and name:
+                usage[current][name] += int(fields[1]) * 1024
+    return usage
+
+
+def estimate_index_bytes(faiss_index, include_vectors=True):
+    """
+    Rough heap size of a loaded LangChain FAISS store: the index structure (unless
+    memory-mapped) plus chunk text held in memory (none for a lazily read chunk store).
+    """
+    vectors = index_memory_bytes(faiss_index.index) if include_vectors else 0
+    texts = 0
+    for doc in getattr(faiss_index.docstore, "_dict", {}).values():
+        texts += len(doc.page_content) + len(str(doc.metadata))
+    return vectors + texts
+
+
+def on_demand_file_bytes(local_dir, mmapped):
+    """
+    Size of the topic files an entry reads on demand instead of holding on the heap: the
+    memory-mapped index.faiss and chunks.sqlite. Their pages end up in memory as they are
+    searched, so they count against the cache budget like loaded data.
+    """
+    names = [CHUNKS_FILE] + ([INDEX_FILE] if mmapped else [])
+    paths = [os.path.join(local_dir, name) for name in names]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+class TopicIndexCache:
+    """
+    LRU cache of loaded topic FAISS indexes, bounded by an approximate memory budget and
+    a maximum number of topics.
+
+    Cached copies are validated against the ETag/LastModified of the topic manifest (or of
+    the index objects for legacy topics), at most once every `revalidate_seconds`.
+    """
+
+    def __init__(
+        self,
+        max_bytes=INDEX_CACHE_MAX_MB * 1024 * 1024,
+        revalidate_seconds=INDEX_CACHE_REVALIDATE_SECONDS,
+        max_entries=INDEX_CACHE_MAX_ENTRIES,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._topic_locks = {}
+        self._stats = {"hits": 0, "revalidated_hits": 0, "misses": 0, "reloads": 0, "evictions": 0}
+        self._listeners = []
+
+    def add_invalidation_listener(self, listener):
+        """
+        Call listener(topic_name) whenever a topic's cached index is replaced by a new
+        version, evicted or invalidated, so data derived from it can be dropped too.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, topic_names):
+        for topic_name in topic_names:
+            for listener in self._listeners:
+                listener(topic_name)
+
+    def _topic_lock(self, topic_name):
+        with self._lock:
+            return self._topic_locks.setdefault(topic_name, threading.Lock())
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def borrow(self, topic_name: str):
+        """
+        Return the cache entry of a topic, loading it from S3 when missing or stale. Its
+        store (`faiss_index`) and `version` stay usable, with their files on disk, until the
+        entry is passed to give_back(), even if the cache evicts or replaces it meanwhile.
+        """
+        return self._get_entry(topic_name)
+
+    def give_back(self, entry: CachedIndex):
+        with self._lock:
+            entry.give_back()
+
+    def _get_entry(self, topic_name: str):
+        with self._lock:
+            entry = self._entries.get(topic_name)
+            if entry and time.monotonic() - entry.checked_at < self.revalidate_seconds:
+                self._entries.move_to_end(topic_name)
+                self._stats["hits"] += 1
+                entry.borrows += 1
+                return entry
+
+        # One loader per topic; other threads asking for the same topic wait for it
+        with self._topic_lock(topic_name):
+            with self._lock:
+                entry = self._entries.get(topic_name)
+                if entry and time.monotonic() - entry.checked_at < self.revalidate_seconds:
+                    self._entries.move_to_end(topic_name)
+                    self._stats["hits"] += 1
+                    entry.borrows += 1
+                    return entry
+
+            s3 = get_s3_client()
+            version, objects, _ = resolve_topic_index(s3, topic_name)
+            if not objects:
+                self.invalidate(topic_name)
+                raise FileNotFoundError(f"No FAISS index found at S3 prefix {topic_name}/")
+
+            if entry and entry.version == version:
+                with self._lock:
+                    # Evicted while S3 was asked: its files may be gone, so load it again
+                    if not entry.retired:
+                        entry.checked_at = time.monotonic()
+                        self._entries.move_to_end(topic_name)
+                        self._stats["revalidated_hits"] += 1
+                        entry.borrows += 1
+                        return entry
+
+            self._count("reloads" if entry else "misses")
+            loaded = self._load(s3, topic_name, version, objects)
+            self._store(loaded)
+            return loaded
+
+    def _load(self, s3, topic_name, version, objects):
+        start = time.perf_counter()
+        populate = lambda tmp_dir: download_topic_index(s3, topic_name, objects, tmp_dir)
+        # Workers on the same host share one downloaded copy per topic version
+        with topic_workspace(topic_name, version, populate) as local_dir:
+            faiss_index, mmapped = load_topic_store(local_dir, mmap=INDEX_MMAP)
+            # Keep the directory referenced while its files are mapped or read on demand
+            ref_token = acquire(local_dir)
+        logging.info(
+            f"Loaded FAISS index for topic '{topic_name}' in {time.perf_counter() - start:.2f}s"
+            f" ({'memory-mapped' if mmapped else 'in memory'})"
+        )
+        size_bytes = estimate_index_bytes(faiss_index, include_vectors=not mmapped) + on_demand_file_bytes(local_dir, mmapped)
+        return CachedIndex(topic_name, version, faiss_index, size_bytes, local_dir, ref_token, mmapped)
+
+    def _store(self, entry):
+        dropped = []
+        with self._lock:
+            # Borrowed by the request that loaded it
+            entry.borrows += 1
+            previous = self._entries.get(entry.topic_name)
+            if previous is not None:
+                previous.retire()
+                dropped.append(entry.topic_name)
+            self._entries[entry.topic_name] = entry
+            self._entries.move_to_end(entry.topic_name)
+            total = sum(e.size_bytes for e in self._entries.values())
+            # Evict least recently used topics, but always keep the one just loaded
+            while (total > self.max_bytes or len(self._entries) > self.max_entries) and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                total -= evicted.size_bytes
+                evicted.retire()
+                dropped.append(evicted.topic_name)
+                self._stats["evictions"] += 1
+                logging.info(f"Evicted FAISS index for topic '{evicted.topic_name}' from cache")
+        self._notify(dropped)
+
+    def invalidate(self, topic_name: str):
+        with self._lock:
+            entry = self._entries.pop(topic_name, None)
+            if entry is not None:
+                entry.retire()
+        self._notify([topic_name])
+
+    def stats(self):
+        """
+        Cache counters plus, per topic, the size counted against the budget (heap estimate
+        plus files read on demand) and the memory of the mapped index file in this process
+        (from /proc/self/smaps).
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            entries = list(self._entries.values())
+        mapped = mapped_file_usage([e.index_path for e in entries if e.mmapped])
+        stats["topics"] = {
+            e.topic_name: {
+                "version": e.version,
+                "size_bytes": e.size_bytes,
+                "mmapped": e.mmapped,
+                "borrows": e.borrows,
+                "mapped": mapped.get(e.index_path),
+            }
+            for e in entries
+        }
+        stats["size_bytes"] = sum(e.size_bytes for e in entries)
+        stats["mapped_rss_bytes"] = sum(m["rss_bytes"] for m in mapped.values())
+        stats["max_bytes"] = self.max_bytes
+        stats["max_entries"] = self.max_entries
+        return stats
+
+
+topic_index_cache = TopicIndexCache()
@@ -0,0 +1,127 @@
+import datetime
+import os
+
+from sqlalchemy import create_engine, Column, BigInteger, Integer, String, Text, JSON, TIMESTAMP
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from workspace import WORKSPACE_ROOT
+
+# Queue upload jobs are published to
+INGEST_QUEUE = os.getenv("INGEST_QUEUE", "ingest_jobs")
+
+# Hand upload jobs to ingest workers over RabbitMQ. With 0, or whenever a job cannot be
+# queued, the API process runs the job itself (for deployments without broker or worker).
+INGEST_USE_QUEUE = os.getenv("INGEST_USE_QUEUE", "1") == "1"
+
+# Job state lives in the shared workspace so the API and the ingest worker see the same rows
+os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+INGEST_JOBS_URL = os.getenv("INGEST_JOBS_URL", f"sqlite:///{os.path.join(WORKSPACE_ROOT, 'ingest_jobs.db')}")
+
+# Job lifecycle: queued -> extracting -> embedding -> [uploading ->] done, or failed at any stage
+JOB_STATUSES = ["queued", "extracting", "embedding", "uploading", "done", "failed"]
+
+Base = declarative_base()
+
+
+class IngestJob(Base):
+    __tablename__ = 'ingest_jobs'
+    job_id = Column(String(32), primary_key=True)
+    status = Column(String(16), nullable=False, default="queued")
+    s3_folder_name = Column(String(255), nullable=True)
+    files = Column(JSON, nullable=False)
+    pages_total = Column(Integer, default=0)
+    pages_extracted = Column(Integer, default=0)
+    chunks_total = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    bytes_total = Column(BigInteger, default=0)
+    bytes_uploaded = Column(BigInteger, default=0)
+    error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+    updated_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
+
+
+engine = create_engine(INGEST_JOBS_URL, connect_args={"check_same_thread": False, "timeout": 30})
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+
+def _job_to_dict(job: IngestJob):
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "s3_folder_name": job.s3_folder_name,
+        "files": job.files,
+        "progress": {
+            "pages_extracted": job.pages_extracted,
+            "pages_total": job.pages_total,
+            "chunks_embedded": job.chunks_embedded,
+            "chunks_total": job.chunks_total,
+            "bytes_uploaded": job.bytes_uploaded,
+            "bytes_total": job.bytes_total,
+        },
+        "error": job.error,
+        "result": job.result,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+def create_job(job_id: str, files: list, s3_folder_name: str = None):
+    """
+    Record a queued ingest job. `files` holds the describe() of each upload plus its path.
+    """
+    db = SessionLocal()
+    try:
+        job = IngestJob(job_id=job_id, status="queued", s3_folder_name=s3_folder_name, files=files)
+        db.add(job)
+        db.commit()
+        return _job_to_dict(job)
+    finally:
+        db.close()
+
+
+def claim_job(job_id: str):
+    """
+    Atomically move a queued job to "extracting". Returns False when the job is not
+    queued any more, e.g. because a worker and the API's in-process fallback both got it.
+    """
+    db = SessionLocal()
+    try:
+        claimed = (
+            db.query(IngestJob)
+            .filter(IngestJob.job_id == job_id, IngestJob.status == "queued")
+            .update({"status": "extracting", "updated_at": datetime.datetime.utcnow()}, synchronize_session=False)
+        )
+        db.commit()
+        return claimed == 1
+    finally:
+        db.close()
+
+
+def update_job(job_id: str, **fields):
+    """
+    Set the given columns of a job (status, progress counters, error, result).
+    """
+    if "status" in fields and fields["status"] not in JOB_STATUSES:
+        raise ValueError(f"Unknown job status '{fields['status']}'")
+    db = SessionLocal()
+    try:
+        fields["updated_at"] = datetime.datetime.utcnow()
+        db.query(IngestJob).filter(IngestJob.job_id == job_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+def get_job(job_id: str):
+    """
+    Return a job as a dict, or None when it does not exist.
+    """
+    db = SessionLocal()
+    try:
+        job = db.query(IngestJob).filter(IngestJob.job_id == job_id).first()
+        return _job_to_dict(job) if job else None
+    finally:
+        db.close()
@@ -0,0 +1,74 @@
+"""
+Ingest worker: consumes upload jobs from RabbitMQ and builds their FAISS indexes.
+
+Run one or more next to the API (they share WORKSPACE_ROOT):
+    python ingest_worker.py
+"""
+import functools
+import json
+import logging
+import threading
+import time
+
+import pika
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from embedding_service import get_embedding_service
+from ingest_jobs import INGEST_QUEUE
+from ingestion import run_ingest_job
+from rabbitmq_publisher import RABBITMQ_URL
+
+
+def _ack(channel, delivery_tag):
+    if channel.is_open:
+        channel.basic_ack(delivery_tag)
+
+
+def _handle_message(connection, channel, delivery_tag, body):
+    """
+    Runs on its own thread so the connection keeps sending heartbeats during long jobs.
+    """
+    try:
+        message = json.loads(body)
+        run_ingest_job(message["job_id"])
+    except Exception as e:
+        # run_ingest_job records its own failures; this only catches malformed messages
+        logging.error(f"Could not process ingest message {body!r}: {e}")
+    try:
+        connection.add_callback_threadsafe(functools.partial(_ack, channel, delivery_tag))
+    except Exception as e:
+        logging.warning(f"Could not acknowledge ingest message (it will be redelivered): {e}")
+
+
+def consume():
+    connection = pika.BlockingConnection(pika.URLParameters(RABBITMQ_URL))
+    channel = connection.channel()
+    channel.queue_declare(queue=INGEST_QUEUE, durable=True)
+    # One job at a time per worker; start more workers to ingest in parallel
+    channel.basic_qos(prefetch_count=1)
+
+    def on_message(ch, method, properties, body):
+        threading.Thread(
+            target=_handle_message, args=(connection, ch, method.delivery_tag, body), daemon=True,
+        ).start()
+
+    channel.basic_consume(queue=INGEST_QUEUE, on_message_callback=on_message)
+    logging.info(f"Waiting for ingest jobs on queue '{INGEST_QUEUE}'")
+    channel.start_consuming()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    get_embedding_service().load()
+    while True:
+        try:
+            consume()
+        except pika.exceptions.AMQPConnectionError as e:
+            logging.warning(f"RabbitMQ connection lost ({e}); reconnecting in 5s")
+            time.sleep(5)
+
+
+if __name__ == "__main__":
+    main()
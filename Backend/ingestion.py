@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.vectorstores import FAISS
+
+from ann_index import build_ann_index
+from chunk_store import save_topic_store
+from embedding_service import get_embedding_service
+from ingest_jobs import claim_job, get_job, update_job
+from pdf_extract import count_pages, iter_documents, submit_pdf
+from text_chunker import TextChunker
+from topic_store import get_s3_client, list_topic_objects, publish_topic_index
+from topic_updates import chunk_content_hash
+from workspace import atomic_dir, build_dir, job_workspace, referenced, remove_if_unreferenced
+
+# Chunks embedded between two progress updates of an ingest job
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "512"))
+
+# Minimum seconds between two progress writes to the job table
+INGEST_PROGRESS_INTERVAL = float(os.getenv("INGEST_PROGRESS_INTERVAL", "1.0"))
+
+# Upload jobs the API process runs at once when it cannot hand them to an ingest worker
+INLINE_INGEST_WORKERS = int(os.getenv("INLINE_INGEST_WORKERS", "1"))
+
+_inline_pool = ThreadPoolExecutor(max_workers=INLINE_INGEST_WORKERS, thread_name_prefix="ingest")
+
+
+def split_documents(documents):
+    # Same boundaries as RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50), without the substring copies
+    text_splitter = TextChunker()
+    chunked_docs = text_splitter.split_documents(documents)
+    # Chunk-level content hashes let later appends skip pages the topic already has
+    for doc in chunked_docs:
+        doc.metadata["content_hash"] = chunk_content_hash(doc.page_content)
+    logging.info(f"Total number of chunks created: {len(chunked_docs)}")
+    return chunked_docs
+
+
+def create_faiss_index(chunked_docs, index_dir="faiss_index", progress=None):
+    """
+    Embed the chunks in batches of INGEST_EMBED_BATCH and save a FAISS index to index_dir.
+    The index type (flat, HNSW, IVF-Flat or IVF-PQ) follows ANN_INDEX_TYPE / the chunk count.
+    `progress`, when given, is called with the number of chunks embedded so far.
+    Returns the index meta saved with it.
+    """
+    if not chunked_docs:
+        raise ValueError("No text could be extracted from the uploaded PDFs.")
+    embedding_model = get_embedding_service()
+    texts = [doc.page_content for doc in chunked_docs]
+    vectors = []
+    for start in range(0, len(texts), INGEST_EMBED_BATCH):
+        vectors.extend(embedding_model.embed_documents(texts[start:start + INGEST_EMBED_BATCH]))
+        if progress:
+            progress(len(vectors))
+    index, index_meta = build_ann_index(np.asarray(vectors, dtype="float32"))
+    docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(chunked_docs)})
+    faiss_index = FAISS(embedding_model, index, docstore, {i: str(i) for i in range(len(chunked_docs))})
+    # Write into a private directory and publish it with a single rename
+    with atomic_dir(index_dir) as tmp_dir:
+        save_topic_store(faiss_index, tmp_dir, index_meta)
+    logging.info(f"FAISS index ({index_meta['index_type']}) saved locally as '{index_dir}'.")
+    return index_meta
+
+
+class JobProgress:
+    """
+    Thread-safe progress counters of one job, written to the job table at most every
+    INGEST_PROGRESS_INTERVAL seconds (boto3 reports upload bytes from several threads).
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._last_write = 0.0
+
+    def set(self, force=False, **counters):
+        with self._lock:
+            self._counters.update(counters)
+            self._write(force)
+
+    def add(self, name: str, delta: int):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + delta
+            self._write(False)
+
+    def flush(self):
+        with self._lock:
+            self._write(True)
+
+    def _write(self, force):
+        now = time.monotonic()
+        if force or now - self._last_write >= INGEST_PROGRESS_INTERVAL:
+            update_job(self.job_id, **self._counters)
+            self._last_write = now
+
+
+def run_ingest_job(job_id: str):
+    """
+    Build the FAISS index of a queued upload job and, when the job names an S3 folder,
+    publish it as a new topic. Progress and the outcome are recorded in the job table;
+    the uploaded PDFs are removed when the job ends.
+    """
+    job = get_job(job_id)
+    if job is None:
+        logging.warning(f"Ingest job {job_id} does not exist; skipping.")
+        return
+    if not claim_job(job_id):
+        logging.info(f"Ingest job {job_id} is already {job['status']}; skipping.")
+        return
+
+    topic_name = job["s3_folder_name"]
+    progress = JobProgress(job_id)
+    start = time.perf_counter()
+    try:
+        with job_workspace(job_id):
+            s3 = get_s3_client()
+            if topic_name and list_topic_objects(s3, topic_name):
+                raise ValueError(f"Folder {topic_name} already exists in S3. Please delete it before proceeding.")
+
+            paths = [f["path"] for f in job["files"]]
+            update_job(job_id, pages_total=sum(count_pages(path) for path in paths))
+            submitted = [submit_pdf(path) for path in paths]
+
+            def counted_pages():
+                for pages, doc in enumerate(iter_documents(submitted), start=1):
+                    progress.set(pages_extracted=pages)
+                    yield doc
+                progress.flush()
+
+            chunked_docs = split_documents(counted_pages())
+
+        update_job(job_id, status="embedding", chunks_total=len(chunked_docs))
+        index_dir = build_dir(job_id)
+        index_meta = create_faiss_index(chunked_docs, index_dir, progress=lambda done: progress.set(chunks_embedded=done))
+        progress.flush()
+        result = {"job_id": job_id, "chunks": len(chunked_docs), "index_type": index_meta["index_type"]}
+
+        if topic_name:
+            bytes_total = sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir))
+            update_job(job_id, status="uploading", bytes_total=bytes_total)
+            with referenced(index_dir):
+                manifest = publish_topic_index(
+                    s3, topic_name, index_dir, {"chunks": len(chunked_docs)},
+                    progress=lambda sent: progress.add("bytes_uploaded", sent),
+                )
+            progress.flush()
+            remove_if_unreferenced(index_dir)
+            result.update({"s3_folder_name": topic_name, "version": manifest["version"]})
+
+        result["seconds"] = round(time.perf_counter() - start, 2)
+        update_job(job_id, status="done", result=result)
+        logging.info(f"Ingest job {job_id} finished: {result}")
+    except Exception as e:
+        logging.error(f"Ingest job {job_id} failed: {e}")
+        logging.error(traceback.format_exc())
+        update_job(job_id, status="failed", error=str(e))
+
+
+def run_ingest_job_inline(job_id: str):
+    """
+    Run an upload job on this process's ingest thread instead of an ingest worker.
+    """
+    logging.info(f"Running ingest job {job_id} in the API process")
+    return _inline_pool.submit(run_ingest_job, job_id)
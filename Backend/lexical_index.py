@@ -0,0 +1,124 @@
+import os
+import re
+
+# Build a BM25 inverted index next to the chunks of every saved topic (set LEXICAL_INDEX_ENABLED=0 to disable)
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "1") == "1"
+
+# Reciprocal-rank fusion constant: a chunk ranked r in a list scores 1 / (RRF_K + r)
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Terms found in more than this fraction of a topic's chunks are left out of lexical
+# queries: their BM25 weight is tiny, but scoring their long posting lists costs tens of
+# milliseconds on large topics
+LEXICAL_MAX_DOC_FRACTION = float(os.getenv("LEXICAL_MAX_DOC_FRACTION", "0.02"))
+
+# FTS5 table over chunks.text. It is an external-content table, so only the inverted index
+# is stored, not a second copy of the text. unicode61 keeps acronyms, variable names and
+# algorithm names as whole lower-cased terms. There is no stemming, so query terms can be
+# looked up in the frequent-terms table as typed.
+LEXICAL_TABLE = "chunks_fts"
+
+# Document counts of the terms that may be pruned, computed once at build time
+FREQUENT_TERMS_TABLE = "chunks_fts_frequent"
+
+# Terms in at most this many chunks are always cheap to score and are never pruned
+_MIN_PRUNED_DOCS = 500
+
+# Words too common to help a lexical match; they only lengthen the posting lists read
+_STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it",
+    "of", "on", "or", "that", "the", "to", "with",
+}
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def build_lexical_index(conn):
+    """
+    Create and fill the FTS5 table over the `chunks` table of an open chunk store, plus
+    the document counts of its frequent terms.
+    """
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {LEXICAL_TABLE} USING fts5("
+        f"text, content='chunks', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    conn.execute(f"INSERT INTO {LEXICAL_TABLE}({LEXICAL_TABLE}) VALUES ('rebuild')")
+    # Merge the index segments into one b-tree: smaller file, fewer pages read per query
+    conn.execute(f"INSERT INTO {LEXICAL_TABLE}({LEXICAL_TABLE}) VALUES ('optimize')")
+
+    # fts5vocab counts documents by walking posting lists, far too slow per query, so the
+    # counts are copied into a plain table once
+    conn.execute(f"CREATE VIRTUAL TABLE temp.vocab USING fts5vocab(main, {LEXICAL_TABLE}, 'row')")
+    conn.execute(f"CREATE TABLE {FREQUENT_TERMS_TABLE} (term TEXT PRIMARY KEY, docs INTEGER NOT NULL) WITHOUT ROWID")
+    conn.execute(
+        f"INSERT INTO {FREQUENT_TERMS_TABLE} (term, docs) SELECT term, doc FROM temp.vocab WHERE doc > ?",
+        (_MIN_PRUNED_DOCS,),
+    )
+    conn.execute("DROP TABLE temp.vocab")
+
+
+def has_lexical_index(conn):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (LEXICAL_TABLE,)).fetchone()
+    return row is not None
+
+
+def query_terms(text: str):
+    """
+    Distinct lower-cased terms of free text, without stop words and single characters.
+    """
+    terms = dict.fromkeys(term.lower() for term in _TERM.findall(text))
+    return [term for term in terms if len(term) > 1 and term not in _STOP_WORDS]
+
+
+def prune_frequent_terms(conn, terms):
+    """
+    Drop the terms that occur in more than LEXICAL_MAX_DOC_FRACTION of the chunks.
+    """
+    if not terms:
+        return terms
+    chunk_count = conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM chunks").fetchone()[0]
+    limit = max(LEXICAL_MAX_DOC_FRACTION * chunk_count, _MIN_PRUNED_DOCS)
+    placeholders = ",".join("?" * len(terms))
+    frequent = {
+        term for term, docs in conn.execute(
+            f"SELECT term, docs FROM {FREQUENT_TERMS_TABLE} WHERE term IN ({placeholders})", terms,
+        )
+        if docs > limit
+    }
+    return [term for term in terms if term not in frequent]
+
+
+def match_expression(terms):
+    """
+    FTS5 MATCH expression that ORs the quoted terms, or None if there are none. Quoting
+    keeps user text from being parsed as FTS5 syntax (NEAR, column filters, ...).
+    """
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def lexical_search(conn, text: str, k: int):
+    """
+    Ids of the `k` chunks with the best BM25 score for `text`, best first (FTS5's rank is
+    bm25()). Empty when every term of `text` is too frequent to be worth matching.
+    """
+    expression = match_expression(prune_frequent_terms(conn, query_terms(text)))
+    if expression is None:
+        return []
+    rows = conn.execute(
+        f"SELECT rowid FROM {LEXICAL_TABLE} WHERE {LEXICAL_TABLE} MATCH ? ORDER BY rank LIMIT ?",
+        (expression, k),
+    )
+    return [row[0] for row in rows]
+
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K):
+    """
+    Fuse several best-first id lists into {id: score} with reciprocal-rank fusion.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return scores
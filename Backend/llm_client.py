@@ -0,0 +1,138 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from langchain_groq import ChatGroq
+
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gemma2-9b-it")
+
+# Maximum number of LLM requests in flight per worker; extra callers wait their turn
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Threads used for blocking S3, FAISS, PDF and reportlab work called from async endpoints
+BLOCKING_POOL_WORKERS = int(os.getenv("BLOCKING_POOL_WORKERS", "8"))
+
+_http_async_client = None
+_clients = {}
+_clients_lock = threading.Lock()
+_semaphore = None
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_WORKERS, thread_name_prefix="blocking")
+
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "errors": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "wait_seconds": 0.0,
+    "call_seconds": 0.0,
+}
+
+
+def _get_http_async_client():
+    global _http_async_client
+    if _http_async_client is None:
+        _http_async_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY),
+            timeout=httpx.Timeout(120.0, connect=10.0),
+        )
+    return _http_async_client
+
+
+def get_llm(max_tokens: int):
+    """
+    Return the shared ChatGroq client for a max_tokens setting.
+    All clients reuse one pooled HTTP connection set.
+    """
+    with _clients_lock:
+        llm = _clients.get(max_tokens)
+        if llm is None:
+            llm = ChatGroq(
+                api_key=os.getenv('GROQ_API_KEY'),
+                model=LLM_MODEL_NAME,
+                max_tokens=max_tokens,
+                http_async_client=_get_http_async_client(),
+            )
+            _clients[max_tokens] = llm
+    return llm
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _record(**deltas):
+    with _stats_lock:
+        for name, delta in deltas.items():
+            _stats[name] += delta
+        _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+
+
+async def ainvoke_llm(messages, max_tokens: int):
+    """
+    Call the LLM without blocking the event loop, bounded by LLM_MAX_CONCURRENCY.
+    """
+    llm = get_llm(max_tokens)
+    queued = time.perf_counter()
+    async with _get_semaphore():
+        started = time.perf_counter()
+        _record(in_flight=1, wait_seconds=started - queued)
+        try:
+            return await llm.ainvoke(messages)
+        except Exception:
+            _record(errors=1)
+            raise
+        finally:
+            _record(in_flight=-1, calls=1, call_seconds=time.perf_counter() - started)
+
+
+async def astream_llm(messages, max_tokens: int):
+    """
+    Stream the LLM completion as text fragments, holding one concurrency slot until done.
+    """
+    llm = get_llm(max_tokens)
+    queued = time.perf_counter()
+    async with _get_semaphore():
+        started = time.perf_counter()
+        _record(in_flight=1, wait_seconds=started - queued)
+        try:
+            async for chunk in llm.astream(messages):
+                if chunk.content:
+                    yield chunk.content
+        except Exception:
+            _record(errors=1)
+            raise
+        finally:
+            _record(in_flight=-1, calls=1, call_seconds=time.perf_counter() - started)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking function in the shared thread pool and await its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_blocking_pool, lambda: func(*args, **kwargs))
+
+
+async def close_llm_clients():
+    global _http_async_client
+    if _http_async_client is not None:
+        await _http_async_client.aclose()
+        _http_async_client = None
+    with _clients_lock:
+        _clients.clear()
+
+
+def llm_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["max_concurrency"] = LLM_MAX_CONCURRENCY
+    stats["avg_call_seconds"] = stats["call_seconds"] / stats["calls"] if stats["calls"] else None
+    stats["avg_wait_seconds"] = stats["wait_seconds"] / stats["calls"] if stats["calls"] else None
+    return stats
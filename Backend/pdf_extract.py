@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Worker processes used for PDF text extraction
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+
+# Pages handed to a worker in one task; large PDFs are split into several tasks
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_extract_pool():
+    """
+    Shared process pool. Workers are spawned rather than forked so they do not inherit
+    the embedding model and thread state of the API process.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def count_pages(path: str):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _extract_page_range(path: str, start: int, end: int):
+    """
+    Runs in a worker process: extract the text of pages [start, end) of one PDF.
+    """
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(page_number, reader.pages[page_number].extract_text()) for page_number in range(start, end)]
+
+
+def submit_pdf(path: str, pages_per_task: int = PDF_PAGES_PER_TASK):
+    """
+    Queue extraction of one PDF as page-range tasks and return (path, futures) in page order.
+    """
+    pool = get_extract_pool()
+    page_count = count_pages(path)
+    futures = [
+        pool.submit(_extract_page_range, path, start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+    return path, futures
+
+
+def iter_documents(submitted):
+    """
+    Yield Documents for submitted PDFs in deterministic order (file order, then page order),
+    with the same `source`/`page` metadata as PyPDFLoader. Each range is yielded as soon
+    as it and everything before it are done.
+    """
+    from langchain.docstore.document import Document
+
+    for path, futures in submitted:
+        for future in futures:
+            for page_number, text in future.result():
+                yield Document(page_content=text, metadata={"source": path, "page": page_number})
+
+
+def extract_documents(paths):
+    """
+    Extract every page of the given PDFs across the process pool.
+    """
+    submitted = [submit_pdf(path) for path in paths]
+    return iter_documents(submitted)
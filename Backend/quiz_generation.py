@@ -0,0 +1,124 @@
+import json
+
+# Bump whenever the wording of the quiz prompt changes, so cached generations are not reused
+QUIZ_PROMPT_VERSION = 1
+
+QUIZ_SYSTEM_PROMPT = "You are a helpful assistant that creates quiz questions based on the provided content."
+
+# Keys every generated question must have
+QUIZ_QUESTION_KEYS = {"question", "choices", "answer"}
+
+
+def format_question_counts(question_counts: dict):
+    return (
+        f"Multiple Choice: {question_counts.get('multipleChoice', 0)}, "
+        f"True/False: {question_counts.get('trueFalse', 0)}, "
+        f"Short Answer: {question_counts.get('shortAnswer', 0)}, "
+        f"Long Answer: {question_counts.get('longAnswer', 0)}"
+    )
+
+
+def build_quiz_prompt(context: str, topic_name: str, subtopics_str: str, question_counts: dict, num_questions: int, extra_info: str):
+    """
+    Build the user prompt asking the model for a JSON array of quiz questions.
+    """
+    counts_string = format_question_counts(question_counts)
+    return (
+        "You are an expert quiz question generator working for a professional-grade AI teaching assistant platform. "
+        "Your task is to create high-quality, knowledge-testing quiz questions from the provided context, strictly following the defined structure.\n\n"
+
+        "📘 General Rules for All Questions:\n"
+        "- *Clarity:* Questions must be grammatically correct, precise, and clearly phrased.\n"
+        "- *Relevance:* Use only the information provided in the context below. Do NOT fabricate facts.\n"
+        "- *Diversity:* Avoid repetition. Each question should test a different idea.\n"
+        "- *Accuracy:* All information must be correct as of the 2023-10 knowledge cutoff.\n"
+        "- *Format Compliance:* Output must strictly follow the specified JSON format. Do not include anything else.\n\n"
+
+        "📑 Question Type Instructions:\n"
+        "- *Multiple Choice:* Provide 4 answer options in `choices`. Only ONE should be correct. Distractors must be plausible.\n"
+        "- *True/False:* Provide 1 factual statement. `choices` must be exactly `[\"True\", \"False\"]`. Answer must match one.\n"
+        "- *Short Answer:* Ask a conceptual question. Set `choices` to `null`. Answer should be 1–2 sentences.\n"
+        "- *Long Answer:* Ask a deep, analytical question. Set `choices` to `null`. Answer should be 4–5 sentences.\n\n"
+
+        "📦 Output Format:\n"
+        "- Return ONLY a JSON array of objects.\n"
+        "- Each object must follow this exact format:\n"
+        "  {\n"
+        "    \"question\": \"string\",\n"
+        "    \"choices\": [\"option1\", \"option2\", ...] or null,\n"
+        "    \"answer\": \"string\"\n"
+        "  }\n"
+        "- Do NOT include explanations, extra fields, or any other text.\n\n"
+
+        "🧪 Examples:\n"
+        "- Multiple Choice:\n"
+        "  {\n"
+        "    \"question\": \"Which gas is most abundant in Earth's atmosphere?\",\n"
+        "    \"choices\": [\"Oxygen\", \"Hydrogen\", \"Nitrogen\", \"Carbon Dioxide\"],\n"
+        "    \"answer\": \"Nitrogen\"\n"
+        "  }\n"
+        "- True/False:\n"
+        "  {\n"
+        "    \"question\": \"Water boils at 100 degrees Celsius at sea level.\",\n"
+        "    \"choices\": [\"True\", \"False\"],\n"
+        "    \"answer\": \"True\"\n"
+        "  }\n"
+        "- Short Answer:\n"
+        "  {\n"
+        "    \"question\": \"What is the main function of red blood cells?\",\n"
+        "    \"choices\": null,\n"
+        "    \"answer\": \"They transport oxygen from the lungs to the rest of the body.\"\n"
+        "  }\n"
+        "- Long Answer:\n"
+        "  {\n"
+        "    \"question\": \"Explain how photosynthesis and cellular respiration are interrelated.\",\n"
+        "    \"choices\": null,\n"
+        "    \"answer\": \"Photosynthesis in plants converts carbon dioxide and water into glucose and oxygen using sunlight. Animals and other organisms use oxygen to break down glucose in cellular respiration, producing carbon dioxide and water. The outputs of one process serve as the inputs of the other, forming a biological cycle essential for life.\"\n"
+        "  }\n\n"
+
+        "📚 Context:\n"
+        f"{context}\n\n"
+        f"🎯 Topic: {topic_name}\n"
+        f"🔍 Subtopics: {subtopics_str}\n"
+        f"🧩 Question Type Breakdown:\n{counts_string}\n"
+        f"💡 Extra Info: {extra_info or 'N/A'}\n\n"
+
+        f"✅ Task:\n"
+        f"Generate exactly {num_questions} quiz questions using the above distribution. "
+        "Return ONLY a valid JSON array as specified. No titles, headers, explanations, or surrounding text. "
+        "Total output must stay under 600 tokens if possible."
+    )
+
+
+def build_quiz_messages(context: str, topic_name: str, subtopics_str: str, question_counts: dict, num_questions: int, extra_info: str):
+    """
+    Prepare messages for ChatGroq model invocation.
+    """
+    detailed_prompt = build_quiz_prompt(context, topic_name, subtopics_str, question_counts, num_questions, extra_info)
+    return [
+        ("system", QUIZ_SYSTEM_PROMPT),
+        ("user", detailed_prompt)
+    ]
+
+
+def normalize_quiz_question(question):
+    """
+    Validate one generated question and add the default `your_answer` field.
+    """
+    if not isinstance(question, dict) or not QUIZ_QUESTION_KEYS <= question.keys():
+        raise ValueError("One or more questions are missing required fields.")
+    return {**question, "your_answer": ""}
+
+
+def parse_quiz_questions(content: str):
+    """
+    Parse the raw model output into validated quiz questions.
+    Raises json.JSONDecodeError for invalid JSON and ValueError for a wrong structure.
+    """
+    parsed_response = json.loads(content)
+
+    # Accept a plain list
+    if not isinstance(parsed_response, list):
+        raise ValueError("Expected a list of questions, got something else.")
+
+    return [normalize_quiz_question(q) for q in parsed_response]
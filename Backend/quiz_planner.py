@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from context_packer import fit_budget
+from embedding_service import get_embedding_service
+from llm_client import ainvoke_llm, run_blocking
+from quiz_generation import build_quiz_messages, parse_quiz_questions
+
+# Question types in the order they appear in the final quiz
+QUESTION_TYPES = ["multipleChoice", "trueFalse", "shortAnswer", "longAnswer"]
+
+# Largest number of questions asked from a single LLM call
+QUIZ_MAX_QUESTIONS_PER_CALL = int(os.getenv("QUIZ_MAX_QUESTIONS_PER_CALL", "10"))
+
+# Questions whose MiniLM cosine similarity is above this are treated as duplicates
+QUIZ_DEDUP_THRESHOLD = float(os.getenv("QUIZ_DEDUP_THRESHOLD", "0.9"))
+
+# Extra generation rounds used to replace failed or duplicate questions
+QUIZ_TOPUP_ROUNDS = int(os.getenv("QUIZ_TOPUP_ROUNDS", "1"))
+
+# Context chunks given to each sub-generation
+QUIZ_CHUNKS_PER_CALL = int(os.getenv("QUIZ_CHUNKS_PER_CALL", "5"))
+
+# Prompt tokens of context given to each sub-generation
+QUIZ_CONTEXT_TOKENS_PER_CALL = int(os.getenv("QUIZ_CONTEXT_TOKENS_PER_CALL", "1000"))
+
+# Rough output tokens per question, used to size max_tokens of each call
+TOKENS_PER_QUESTION = {"multipleChoice": 90, "trueFalse": 50, "shortAnswer": 80, "longAnswer": 180}
+
+
+class SubGeneration:
+    def __init__(self, question_type, count, subtopics, context_texts):
+        self.question_type = question_type
+        self.count = count
+        self.subtopics = subtopics
+        self.context_texts = context_texts
+
+    @property
+    def max_tokens(self):
+        return 200 + TOKENS_PER_QUESTION.get(self.question_type, 120) * self.count
+
+
+def plan_sub_generations(question_counts: dict, subtopics: list, context_texts: list):
+    """
+    Split a quiz into sub-generations of at most QUIZ_MAX_QUESTIONS_PER_CALL questions of one type.
+
+    Sub-generations are spread round-robin over the subtopics and each one gets its own
+    round-robin slice of the retrieved passages, so concurrent calls see different material.
+    A slice holds at most QUIZ_CHUNKS_PER_CALL passages and QUIZ_CONTEXT_TOKENS_PER_CALL tokens.
+    """
+    parts = []
+    for question_type in QUESTION_TYPES:
+        remaining = question_counts.get(question_type, 0)
+        while remaining > 0:
+            count = min(remaining, QUIZ_MAX_QUESTIONS_PER_CALL)
+            parts.append((question_type, count))
+            remaining -= count
+
+    plan = []
+    for i, (question_type, count) in enumerate(parts):
+        focus = [subtopics[i % len(subtopics)]] if len(subtopics) > 1 else subtopics
+        context_slice = context_texts[i::len(parts)][:QUIZ_CHUNKS_PER_CALL]
+        if not context_slice:
+            context_slice = context_texts[:QUIZ_CHUNKS_PER_CALL]
+        plan.append(SubGeneration(question_type, count, focus, fit_budget(context_slice, QUIZ_CONTEXT_TOKENS_PER_CALL)))
+    return plan
+
+
+async def run_sub_generation(sub: SubGeneration, topic_name: str, extra_info: str):
+    """
+    Run one sub-generation and return at most `sub.count` questions (empty on failure).
+    """
+    messages = build_quiz_messages(
+        "\n".join(sub.context_texts),
+        topic_name,
+        ", ".join(sub.subtopics),
+        {sub.question_type: sub.count},
+        sub.count,
+        extra_info,
+    )
+    try:
+        response = await ainvoke_llm(messages, max_tokens=sub.max_tokens)
+        return parse_quiz_questions(response.content)[:sub.count]
+    except Exception as e:
+        logging.warning(f"Sub-generation of {sub.count} {sub.question_type} questions failed: {e}")
+        return []
+
+
+def remove_near_duplicates(questions_by_type: dict, threshold: float = QUIZ_DEDUP_THRESHOLD):
+    """
+    Drop questions that are near-duplicates of an earlier question (across all types).
+    """
+    ordered = [(t, q) for t in QUESTION_TYPES for q in questions_by_type.get(t, [])]
+    if not ordered:
+        return questions_by_type, 0
+    vectors = np.asarray(get_embedding_service().encode([q["question"] for _, q in ordered]), dtype="float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+
+    kept = {t: [] for t in QUESTION_TYPES}
+    kept_rows = []
+    removed = 0
+    for row, (question_type, question) in enumerate(ordered):
+        if kept_rows and float(np.max(vectors[kept_rows] @ vectors[row])) >= threshold:
+            removed += 1
+            continue
+        kept_rows.append(row)
+        kept[question_type].append(question)
+    return kept, removed
+
+
+async def generate_quiz_questions(context_texts: list, topic_name: str, subtopics: list, question_counts: dict, extra_info: str):
+    """
+    Generate a quiz by fanning out concurrent sub-generations, merging their results,
+    removing near-duplicates and topping up any missing counts.
+    """
+    start = time.perf_counter()
+    questions_by_type = {t: [] for t in QUESTION_TYPES}
+    missing = {t: question_counts.get(t, 0) for t in QUESTION_TYPES}
+
+    for round_number in range(1 + QUIZ_TOPUP_ROUNDS):
+        round_extra_info = extra_info
+        if round_number > 0:
+            existing = [q["question"] for t in QUESTION_TYPES for q in questions_by_type[t]]
+            round_extra_info = f"{extra_info or ''} Do not repeat any of these questions: {json.dumps(existing)}".strip()
+
+        plan = plan_sub_generations(missing, subtopics, context_texts)
+        if not plan:
+            break
+        logging.info(f"Quiz generation round {round_number}: {len(plan)} concurrent sub-generations")
+        results = await asyncio.gather(*(run_sub_generation(sub, topic_name, round_extra_info) for sub in plan))
+        for sub, questions in zip(plan, results):
+            questions_by_type[sub.question_type].extend(questions)
+
+        questions_by_type, removed = await run_blocking(remove_near_duplicates, questions_by_type)
+        if removed:
+            logging.info(f"Removed {removed} near-duplicate questions")
+        for question_type in QUESTION_TYPES:
+            wanted = question_counts.get(question_type, 0)
+            questions_by_type[question_type] = questions_by_type[question_type][:wanted]
+            missing[question_type] = wanted - len(questions_by_type[question_type])
+        if not any(missing.values()):
+            break
+
+    quiz_questions = [q for t in QUESTION_TYPES for q in questions_by_type[t]]
+    if not quiz_questions:
+        raise ValueError("The model did not return any valid quiz questions.")
+    if any(missing.values()):
+        logging.warning(f"Quiz is short of requested questions after top-up: {missing}")
+    logging.info(f"Generated {len(quiz_questions)} questions in {time.perf_counter() - start:.2f}s")
+    return quiz_questions
@@ -0,0 +1,64 @@
+import json
+
+
+class JsonArrayStreamParser:
+    """
+    Incremental parser for a streamed top-level JSON array of objects.
+
+    Feed it text fragments as they arrive from the model; every call returns the objects
+    whose closing brace has been seen since the previous call. Text before the opening
+    bracket (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_chars = None
+
+    @property
+    def finished(self):
+        return self._finished
+
+    def feed(self, text: str):
+        objects = []
+        for ch in text:
+            if self._finished:
+                break
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+
+            if self._object_chars is not None:
+                self._object_chars.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    if ch != "{":
+                        raise ValueError("Expected a list of question objects.")
+                    self._object_chars = [ch]
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    if ch == "]":
+                        self._finished = True
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    objects.append(json.loads("".join(self._object_chars)))
+                    self._object_chars = None
+        return objects
@@ -0,0 +1,370 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+from langchain.docstore.document import Document
+
+from embedding_service import get_embedding_service
+from index_cache import topic_index_cache
+from lexical_index import reciprocal_rank_fusion
+from lru_cache import LRUCache
+
+# Context chunks retrieved per requested question, bounded by RETRIEVAL_MIN_K / RETRIEVAL_MAX_K
+RETRIEVAL_CHUNKS_PER_QUESTION = float(os.getenv("RETRIEVAL_CHUNKS_PER_QUESTION", "0.5"))
+RETRIEVAL_MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "5"))
+RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "60"))
+
+# Candidates fetched per subtopic for every chunk it should contribute, before MMR picks the final set
+RETRIEVAL_FETCH_FACTOR = int(os.getenv("RETRIEVAL_FETCH_FACTOR", "4"))
+
+# MMR trade-off: 1.0 ranks by relevance only, 0.0 by diversity only (LangChain's default is 0.5)
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5"))
+
+# Fuse BM25 matches of the subtopic terms with the vector results when the topic has a lexical index
+RETRIEVAL_HYBRID = os.getenv("RETRIEVAL_HYBRID", "1") == "1"
+
+# Threads searching the topics of one multi-topic request concurrently (FAISS releases the GIL)
+RETRIEVAL_TOPIC_WORKERS = int(os.getenv("RETRIEVAL_TOPIC_WORKERS", "8"))
+
+# Most topics a single quiz may retrieve from
+RETRIEVAL_MAX_TOPICS = int(os.getenv("RETRIEVAL_MAX_TOPICS", "10"))
+
+# Top-k id lists kept per (topic, index version, query, k); a republished topic gets a new
+# version, so its old results are never served (0 disables)
+RETRIEVAL_RESULT_CACHE_SIZE = int(os.getenv("RETRIEVAL_RESULT_CACHE_SIZE", "4096"))
+
+_STEPS = ["embed_ms", "topics_ms", "mmr_ms", "fetch_ms", "total_ms"]
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "queries": 0, "chunks": 0, **{step: 0.0 for step in _STEPS}}
+_recent = deque(maxlen=20)
+
+_topic_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_TOPIC_WORKERS, thread_name_prefix="retrieval")
+
+result_cache = LRUCache(RETRIEVAL_RESULT_CACHE_SIZE)
+# Results of a topic are dropped as soon as its cached index is replaced, evicted or invalidated
+topic_index_cache.add_invalidation_listener(
+    lambda topic_name: result_cache.discard_where(lambda key: key[0] == topic_name)
+)
+
+
+def adaptive_k(num_questions: int):
+    """
+    Number of context chunks to retrieve for a quiz of `num_questions` questions.
+    """
+    k = math.ceil(num_questions * RETRIEVAL_CHUNKS_PER_QUESTION)
+    return max(RETRIEVAL_MIN_K, min(RETRIEVAL_MAX_K, k))
+
+
+def subtopic_terms(topic_name: str, subtopics: list):
+    """
+    The subtopics to search for, or the topic itself when none are given.
+    """
+    return [s.strip() for s in subtopics if s.strip()] or [topic_name]
+
+
+def subtopic_queries(topic_name: str, subtopics: list):
+    """
+    One short query per subtopic; short queries embed closer to the chunks that cover them
+    than a single sentence listing every subtopic.
+    """
+    terms = subtopic_terms(topic_name, subtopics)
+    if terms == [topic_name]:
+        return terms
+    return [f"{term} ({topic_name})" for term in terms]
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def mmr_merge(query_vectors, candidate_vectors, candidate_lists, k, lambda_mult=RETRIEVAL_MMR_LAMBDA, relevance=None):
+    """
+    Pick up to `k` candidates with max-marginal-relevance, taking turns between the queries.
+
+    `candidate_lists[q]` holds the positions (into candidate_vectors) retrieved for query q.
+    On its turn a query picks, among its own unpicked candidates, the one with the best
+    balance of relevance to the query and dissimilarity to everything picked so far; a
+    query whose candidates are used up yields its turn. Relevance is cosine similarity
+    unless a (queries x candidates) `relevance` matrix is given. Returns candidate
+    positions in pick order.
+    """
+    candidates = _normalize(np.asarray(candidate_vectors, dtype="float32"))
+    if relevance is None:
+        relevance = _normalize(np.asarray(query_vectors, dtype="float32")) @ candidates.T
+    redundancy = np.full(len(candidates), -np.inf, dtype="float32")
+    picked = []
+    taken = np.zeros(len(candidates), dtype=bool)
+    remaining = [list(positions) for positions in candidate_lists]
+
+    turn = 0
+    while len(picked) < min(k, len(candidates)):
+        q = turn % len(remaining)
+        turn += 1
+        remaining[q] = [c for c in remaining[q] if not taken[c]]
+        if not remaining[q]:
+            if not any(remaining):
+                break
+            continue
+        pool = np.asarray(remaining[q])
+        penalty = np.where(np.isfinite(redundancy[pool]), redundancy[pool], 0.0)
+        scores = lambda_mult * relevance[q, pool] - (1 - lambda_mult) * penalty
+        best = int(pool[int(np.argmax(scores))])
+        picked.append(best)
+        taken[best] = True
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return picked
+
+
+def _fetch_documents(faiss_store, vector_ids):
+    """
+    Chunks of `vector_ids`, in order, with None where the docstore has no chunk.
+    """
+    docstore_ids = [faiss_store.index_to_docstore_id.get(i) for i in vector_ids]
+    docstore = faiss_store.docstore
+    # The SQLite chunk store reads every chunk in one query
+    if hasattr(docstore, "search_many"):
+        return docstore.search_many(docstore_ids)
+    # InMemoryDocstore.search returns an error string for unknown ids
+    documents = [docstore.search(docstore_id) if docstore_id is not None else None for docstore_id in docstore_ids]
+    return [doc if isinstance(doc, Document) else None for doc in documents]
+
+
+def search_cached(index, topic_name, version, queries, query_vectors, k):
+    """
+    Top-k vector ids for each query, from the result cache where possible. The queries
+    that miss are searched together in one batched FAISS call. Returns (id lists, hits).
+    """
+    results = [result_cache.get((topic_name, version, query, k)) for query in queries]
+    missing = [i for i, ids in enumerate(results) if ids is None]
+    if missing:
+        _, ids = index.search(query_vectors[missing], k)
+        for i, row in zip(missing, ids):
+            results[i] = tuple(int(vector_id) for vector_id in row if vector_id != -1)
+            result_cache.put((topic_name, version, queries[i], k), results[i])
+    return results, len(queries) - len(missing)
+
+
+def lexical_search_cached(faiss_store, topic_name, version, terms, k):
+    """
+    BM25 rankings of each subtopic's terms, from the result cache where possible. Empty
+    lists for topics without a lexical index (saved before it existed, or legacy pickles).
+    """
+    search = getattr(faiss_store.docstore, "lexical_search", None)
+    if search is None:
+        return [[] for _ in terms]
+    results = []
+    for term in terms:
+        key = (topic_name, version, term, k, "bm25")
+        ids = result_cache.get(key)
+        if ids is None:
+            ids = tuple(search(term, k))
+            result_cache.put(key, ids)
+        results.append(ids)
+    return results
+
+
+def fuse_rankings(vector_ids, lexical_ids, k):
+    """
+    Per query, the top `k` ids of the reciprocal-rank fusion of its vector and BM25
+    rankings, with their fused scores.
+    """
+    fused = []
+    for vector_ranking, lexical_ranking in zip(vector_ids, lexical_ids):
+        scores = reciprocal_rank_fusion([vector_ranking, lexical_ranking])
+        fused.append(sorted(scores.items(), key=lambda item: -item[1])[:k])
+    return fused
+
+
+def topic_candidates(topic_name: str, subtopics: list, queries: list, query_vectors, k: int, borrowed: list):
+    """
+    Search one topic for every subtopic query and return its MMR candidates.
+
+    Each query's vector ranking is fused with its BM25 ranking (when the topic has a
+    lexical index) and scored relative to the query's best hit in this topic, so scores of
+    different topics and indexes can be merged. Runs on the retrieval pool, one call per
+    topic, and reports its own fetch and search timings. The borrowed cache entry is
+    appended to `borrowed` for the caller to give back once it is done with the store.
+    """
+    timings = {}
+    start = time.perf_counter()
+    entry = topic_index_cache.borrow(topic_name)
+    borrowed.append(entry)
+    faiss_store, version = entry.faiss_index, entry.version
+    index = faiss_store.index
+    step = time.perf_counter()
+    timings["index_ms"] = (step - start) * 1000
+
+    per_query = math.ceil(k / len(queries))
+    fetch_k = max(1, min(index.ntotal, per_query * RETRIEVAL_FETCH_FACTOR))
+    ids, cache_hits = search_cached(index, topic_name, version, queries, query_vectors, fetch_k)
+    now = time.perf_counter()
+    timings["search_ms"], step = (now - step) * 1000, now
+
+    lexical_ids = [[] for _ in queries]
+    if RETRIEVAL_HYBRID:
+        terms = subtopic_terms(topic_name, subtopics)
+        lexical_ids = lexical_search_cached(faiss_store, topic_name, version, terms, fetch_k)
+    hybrid = any(lexical_ids)
+    fused = fuse_rankings(ids, lexical_ids, fetch_k) if hybrid else [[(i, None) for i in row] for row in ids]
+    now = time.perf_counter()
+    timings["lexical_ms"], step = (now - step) * 1000, now
+
+    candidate_ids = list(dict.fromkeys(vector_id for row in fused for vector_id, _ in row))
+    position = {vector_id: p for p, vector_id in enumerate(candidate_ids)}
+    candidate_vectors = np.zeros((0, index.d), dtype="float32")
+    if candidate_ids:
+        candidate_vectors = index.reconstruct_batch(np.asarray(candidate_ids, dtype="int64"))
+    if not hybrid:
+        similarity = _normalize(np.asarray(query_vectors, dtype="float32")) @ _normalize(candidate_vectors).T
+        fused = [[(vector_id, float(similarity[q, position[vector_id]])) for vector_id, _ in row] for q, row in enumerate(fused)]
+    # Scaled per query to the best hit, so every topic's best chunk for a subtopic scores 1
+    rows = []
+    for row in fused:
+        top = max((score for _, score in row), default=1.0) or 1.0
+        rows.append([(position[vector_id], score / top) for vector_id, score in row])
+    timings["reconstruct_ms"] = (time.perf_counter() - step) * 1000
+
+    return {
+        "topic_name": topic_name,
+        "store": faiss_store,
+        "candidate_ids": candidate_ids,
+        "candidate_vectors": candidate_vectors,
+        "rows": rows,
+        "timings": timings,
+        "report": {
+            "result_cache_hits": cache_hits,
+            "hybrid": hybrid,
+            "lexical_matches": sum(len(row) for row in lexical_ids),
+            "candidates": len(candidate_ids),
+        },
+    }
+
+
+def retrieve_chunks(topic_names: list, subtopics: list, k: int):
+    """
+    Retrieve `k` diverse chunks covering the subtopics of one or more topics.
+
+    The subtopic queries of every topic are embedded in one batch. Each topic is then
+    searched on the retrieval pool (index fetch, one batched FAISS search, BM25), and
+    the normalized candidates of all topics are merged with MMR, taking turns between
+    every (topic, subtopic) pair. Returns (documents, vectors, report): the vectors are the
+    normalized embeddings of the documents, row for row, and the report holds the
+    milliseconds spent in each step, overall and per topic.
+    """
+    # Cache entries of the searched topics; their files stay on disk until the chunk text
+    # has been fetched, even if the cache evicts them meanwhile
+    borrowed = []
+    try:
+        return _retrieve_chunks(topic_names, subtopics, k, borrowed)
+    finally:
+        for entry in borrowed:
+            topic_index_cache.give_back(entry)
+
+
+def _retrieve_chunks(topic_names: list, subtopics: list, k: int, borrowed: list):
+    report = {"topics": list(topic_names), "k": k}
+    start = time.perf_counter()
+
+    queries_by_topic = [subtopic_queries(topic_name, subtopics) for topic_name in topic_names]
+    all_queries = [query for queries in queries_by_topic for query in queries]
+    all_vectors = np.asarray(get_embedding_service().embed_queries(all_queries), dtype="float32")
+    step = time.perf_counter()
+    report["embed_ms"] = (step - start) * 1000
+
+    per_topic_k = math.ceil(k / len(topic_names))
+    futures = []
+    offset = 0
+    for topic_name, queries in zip(topic_names, queries_by_topic):
+        vectors = all_vectors[offset:offset + len(queries)]
+        offset += len(queries)
+        futures.append(_topic_pool.submit(topic_candidates, topic_name, subtopics, queries, vectors, per_topic_k, borrowed))
+    # The first failing topic (missing index, S3 error) fails the whole retrieval, once
+    # every other topic has finished and recorded what it borrowed
+    wait(futures)
+    topics = [future.result() for future in futures]
+    now = time.perf_counter()
+    report["topics_ms"], step = (now - step) * 1000, now
+
+    # Concatenate the candidates of all topics; each (topic, subtopic) row gets MMR turns
+    owners, local_ids, vectors, rows = [], [], [], []
+    for t, topic in enumerate(topics):
+        base = len(local_ids)
+        owners.extend([t] * len(topic["candidate_ids"]))
+        local_ids.extend(topic["candidate_ids"])
+        vectors.append(topic["candidate_vectors"])
+        rows.extend([[(base + p, score) for p, score in row] for row in topic["rows"]])
+    picked = []
+    candidate_vectors = np.concatenate(vectors)
+    if local_ids:
+        relevance = np.zeros((len(rows), len(local_ids)), dtype="float32")
+        for r, row in enumerate(rows):
+            for p, score in row:
+                relevance[r, p] = score
+        candidate_lists = [[p for p, _ in row] for row in rows]
+        picked = mmr_merge(None, candidate_vectors, candidate_lists, k, relevance=relevance)
+    now = time.perf_counter()
+    report["mmr_ms"], step = (now - step) * 1000, now
+
+    # Fetch chunk text per topic, then restore the MMR pick order
+    documents_by_pick = {}
+    for t, topic in enumerate(topics):
+        topic_picks = [p for p in picked if owners[p] == t]
+        fetch_start = time.perf_counter()
+        documents = _fetch_documents(topic["store"], [local_ids[p] for p in topic_picks])
+        topic["timings"]["fetch_ms"] = (time.perf_counter() - fetch_start) * 1000
+        missing = sum(1 for doc in documents if doc is None)
+        if missing:
+            logging.warning(f"{missing} retrieved chunks of topic '{topic['topic_name']}' are missing from its chunk store")
+        documents_by_pick.update((p, doc) for p, doc in zip(topic_picks, documents) if doc is not None)
+    picked = [p for p in picked if p in documents_by_pick]
+    documents = [documents_by_pick[p] for p in picked]
+    now = time.perf_counter()
+    report["fetch_ms"] = (now - step) * 1000
+    report["total_ms"] = (now - start) * 1000
+
+    report["per_topic"] = {
+        topic["topic_name"]: {
+            **{name: round(value, 2) for name, value in topic["timings"].items()},
+            **topic["report"],
+            "chunks": sum(1 for p in picked if owners[p] == t),
+        }
+        for t, topic in enumerate(topics)
+    }
+    report.update({
+        "queries": len(all_queries),
+        "result_cache_hits": sum(topic["report"]["result_cache_hits"] for topic in topics),
+        "candidates": len(local_ids),
+        "chunks": len(documents),
+    })
+    for name in _STEPS:
+        report[name] = round(report[name], 2)
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["queries"] += len(all_queries)
+        _stats["chunks"] += len(documents)
+        for name in _STEPS:
+            _stats[name] += report[name]
+        _recent.append(report)
+    logging.info(f"Retrieval: {report}")
+    return documents, _normalize(candidate_vectors[picked]), report
+
+
+def retrieval_stats():
+    """
+    Cumulative and average per-step retrieval latency, plus the most recent reports.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+        recent = list(_recent)
+    requests = stats["requests"]
+    stats["avg"] = {name: round(stats[name] / requests, 2) if requests else None for name in _STEPS}
+    stats["result_cache"] = result_cache.stats()
+    stats["recent"] = recent
+    return stats
@@ -0,0 +1,50 @@
+import asyncio
+import hashlib
+import json
+import threading
+
+
+def request_key(payload: dict):
+    """
+    Stable key for a request body, independent of dict ordering.
+    """
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: the first caller for a key starts the computation
+    and every caller that arrives while it is running awaits the same result.
+
+    The computation runs as its own task, so a leader whose client disconnects does not
+    cancel the work the followers are waiting for.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key: str, make_coroutine):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coroutine())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self._count("leaders")
+        else:
+            self._count("coalesced")
+        return await asyncio.shield(task)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["in_flight"] = len(self._in_flight)
+        # Every coalesced caller is one computation (and its LLM calls) that did not run
+        stats["computations_saved"] = stats["coalesced"]
+        return stats
@@ -0,0 +1,203 @@
+"""
+Tests for RabbitMQPublisher against an in-process stand-in for the broker.
+
+FakeConnection and FakeChannel replace pika.SelectConnection through the publisher's
+connection_factory. They run on the publisher's real IO loop and record what is
+published; tests ack, nack or drop the connection from the test thread.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pika
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rabbitmq_publisher
+from rabbitmq_publisher import RabbitMQPublisher, close_publisher
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+class FakeChannel:
+    def __init__(self, connection, auto_ack=False):
+        self.connection = connection
+        self.auto_ack = auto_ack
+        self.is_open = True
+        self.published = []
+        self._on_close = None
+        self._on_confirm = None
+
+    def add_on_close_callback(self, callback):
+        self._on_close = callback
+
+    def confirm_delivery(self, on_confirm, callback):
+        self._on_confirm = on_confirm
+        self.connection.ioloop.add_callback_threadsafe(lambda: callback(None))
+
+    def queue_declare(self, queue, durable, callback):
+        # Like pika, reply on a later IO loop pass, not from inside the call
+        self.connection.ioloop.add_callback_threadsafe(lambda: callback(None))
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((routing_key, json.loads(body)))
+        if self.auto_ack:
+            self.confirm(pika.spec.Basic.Ack(delivery_tag=len(self.published)))
+
+    def confirm(self, method):
+        # Thread-safe: may be called from the test thread
+        frame = SimpleNamespace(method=method)
+        self.connection.ioloop.add_callback_threadsafe(lambda: self._on_confirm(frame))
+
+    def ack(self, delivery_tag):
+        self.confirm(pika.spec.Basic.Ack(delivery_tag=delivery_tag))
+
+    def nack(self, delivery_tag):
+        self.confirm(pika.spec.Basic.Nack(delivery_tag=delivery_tag))
+
+
+class FakeBroker:
+    """
+    Connection factory recording every connection the publisher opens.
+    """
+
+    def __init__(self, auto_ack=False, down=False):
+        self.auto_ack = auto_ack
+        self.down = down
+        self.connections = []
+
+    def __call__(self, parameters, on_open_callback, on_open_error_callback, on_close_callback, custom_ioloop):
+        if self.down:
+            custom_ioloop.add_callback_threadsafe(lambda: on_open_error_callback(None, "connection refused"))
+            return None
+        connection = FakeConnection(self, on_open_callback, on_close_callback, custom_ioloop)
+        self.connections.append(connection)
+        return connection
+
+    @property
+    def channel(self):
+        return self.connections[-1].channel_
+
+
+class FakeConnection:
+    def __init__(self, broker, on_open, on_close, ioloop):
+        self.broker = broker
+        self.ioloop = ioloop
+        self.is_closing = False
+        self.is_closed = False
+        self.channel_ = None
+        self._on_close = on_close
+        ioloop.add_callback_threadsafe(lambda: on_open(self))
+
+    def channel(self, on_open_callback):
+        self.channel_ = FakeChannel(self, self.broker.auto_ack)
+        self.ioloop.add_callback_threadsafe(lambda: on_open_callback(self.channel_))
+
+    def close(self):
+        self.is_closing = True
+        self.ioloop.add_callback_threadsafe(self._closed)
+
+    def drop(self):
+        # Broker went away: the connection closes without the publisher asking
+        self.ioloop.add_callback_threadsafe(self._closed)
+
+    def _closed(self):
+        self.is_closing, self.is_closed = False, True
+        if self.channel_ is not None:
+            self.channel_.is_open = False
+        self._on_close(self, "connection lost")
+
+
+@pytest.fixture
+def broker():
+    return FakeBroker()
+
+
+@pytest.fixture
+def publisher(broker):
+    publisher = RabbitMQPublisher(connection_factory=broker)
+    yield publisher
+    publisher.close(timeout=1.0)
+
+
+def test_apublish_resolves_on_ack(publisher, broker):
+    async def publish():
+        task = asyncio.ensure_future(publisher.apublish("test_queue", {"n": 1}, timeout=5))
+        await asyncio.to_thread(wait_until, lambda: broker.connections and broker.channel and broker.channel.published)
+        broker.channel.ack(1)
+        return await task
+
+    assert asyncio.run(publish()) == 1
+    assert broker.channel.published == [("test_queue", {"n": 1})]
+    assert publisher.stats()["confirmed"] == 1
+
+
+def test_apublish_raises_on_nack(publisher, broker):
+    async def publish():
+        task = asyncio.ensure_future(publisher.apublish("test_queue", {"n": 1}, timeout=5))
+        await asyncio.to_thread(wait_until, lambda: broker.connections and broker.channel and broker.channel.published)
+        broker.channel.nack(1)
+        return await task
+
+    with pytest.raises(RuntimeError, match="did not accept"):
+        asyncio.run(publish())
+    assert publisher.stats()["nacked"] == 1
+
+
+def test_unconfirmed_messages_are_resent_after_reconnect(publisher, broker):
+    futures = [publisher.publish("test_queue", {"n": n}) for n in range(3)]
+    wait_until(lambda: broker.connections and broker.channel and len(broker.channel.published) == 3)
+    broker.channel.ack(1)
+    futures[0].result(timeout=5)
+
+    broker.connections[0].drop()
+    wait_until(lambda: len(broker.connections) == 2 and broker.channel and len(broker.channel.published) == 2)
+
+    # Only the unconfirmed messages go out again, in their original order
+    assert broker.channel.published == [("test_queue", {"n": 1}), ("test_queue", {"n": 2})]
+    broker.channel.ack(1)
+    broker.channel.ack(2)
+    assert [future.result(timeout=5) for future in futures[1:]] == [1, 2]
+    assert publisher.stats()["reconnects"] == 1
+
+
+def test_close_publisher_flushes_outbox_and_stops_thread(monkeypatch):
+    broker = FakeBroker(auto_ack=True)
+    publisher = RabbitMQPublisher(connection_factory=broker)
+    monkeypatch.setattr(rabbitmq_publisher, "_publisher", publisher)
+    publisher.publish("test_queue", {"n": 0}).result(timeout=5)
+
+    futures = [publisher.publish("test_queue", {"n": n}) for n in range(1, 50)]
+    close_publisher()
+
+    assert all(future.result(timeout=0) for future in futures)
+    assert len(broker.channel.published) == 50
+    assert publisher.stats()["outbox"] == 0
+    assert not publisher._thread.is_alive()
+    assert broker.connections[0].is_closed
+
+
+def test_expired_messages_are_dropped_while_broker_is_down():
+    broker = FakeBroker(down=True)
+    publisher = RabbitMQPublisher(connection_factory=broker)
+    try:
+        expiring = publisher.publish("test_queue", {"n": 1}, expiration_ms=50)
+        kept = publisher.publish("test_queue", {"n": 2})
+
+        with pytest.raises(RuntimeError, match="expired"):
+            expiring.result(timeout=5)
+        assert not kept.done()
+        assert publisher.stats()["expired"] == 1
+        assert publisher.stats()["outbox"] == 1
+    finally:
+        publisher.close(timeout=1.0)
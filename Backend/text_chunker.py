@@ -0,0 +1,152 @@
+import os
+import threading
+from bisect import bisect_left
+from collections import deque
+
+from langchain.docstore.document import Document
+
+# Chunk size and overlap, in characters (or embedding-model tokens when CHUNK_LENGTH_UNIT=tokens)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
+CHUNK_LENGTH_UNIT = os.getenv("CHUNK_LENGTH_UNIT", "chars")
+
+# Same order RecursiveCharacterTextSplitter uses: paragraphs, lines, words, characters
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+_tokenizers = {}
+_tokenizers_lock = threading.Lock()
+
+
+def _get_tokenizer(model_name: str):
+    with _tokenizers_lock:
+        if model_name not in _tokenizers:
+            from transformers import AutoTokenizer
+            _tokenizers[model_name] = AutoTokenizer.from_pretrained(model_name)
+        return _tokenizers[model_name]
+
+
+def _pieces(text: str, start: int, end: int, separator: str):
+    """
+    Yield (start, end) spans of text[start:end] split on separator, keeping each separator
+    at the start of the piece that follows it and skipping empty pieces.
+    """
+    if not separator:
+        for i in range(start, end):
+            yield i, i + 1
+        return
+    piece_start = start
+    hit = text.find(separator, start, end)
+    while hit != -1:
+        if hit > piece_start:
+            yield piece_start, hit
+        piece_start = hit
+        hit = text.find(separator, hit + len(separator), end)
+    if end > piece_start:
+        yield piece_start, end
+
+
+class TextChunker:
+    """
+    Drop-in replacement for RecursiveCharacterTextSplitter(keep_separator=True).
+
+    Produces the same chunks as the LangChain splitter but works on (start, end) offsets
+    into the page text: pieces are never copied, separators are found with str.find and
+    the sliding window is a deque, so each page is scanned once per separator level and
+    the only strings allocated are the final chunks.
+
+    With length_unit="tokens" sizes are counted in tokens of the embedding model. The page
+    is tokenized once and span lengths are read from the token offsets.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                 separators=None, length_unit: str = CHUNK_LENGTH_UNIT, token_model: str = None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        if length_unit not in ("chars", "tokens"):
+            raise ValueError(f"Unknown length unit '{length_unit}', expected 'chars' or 'tokens'")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(separators or DEFAULT_SEPARATORS)
+        self.length_unit = length_unit
+        if length_unit == "tokens" and token_model is None:
+            from embedding_service import EMBEDDING_MODEL_NAME
+            token_model = EMBEDDING_MODEL_NAME
+        self.token_model = token_model
+
+    def _length_function(self, text: str):
+        if self.length_unit == "chars":
+            return lambda start, end: end - start
+        encoding = _get_tokenizer(self.token_model)(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False,
+        )
+        token_starts = [offset[0] for offset in encoding["offset_mapping"]]
+        return lambda start, end: bisect_left(token_starts, end) - bisect_left(token_starts, start)
+
+    def split_spans(self, text: str):
+        """
+        Return the (start, end) offsets of every chunk of text.
+        """
+        spans = []
+        self._split(text, 0, len(text), self.separators, self._length_function(text), spans)
+        return spans
+
+    def split_text(self, text: str):
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_documents(self, documents):
+        """
+        Split LangChain documents, copying each document's metadata (source, page) to its chunks.
+        """
+        chunks = []
+        for doc in documents:
+            text = doc.page_content
+            for start, end in self.split_spans(text):
+                chunks.append(Document(page_content=text[start:end], metadata=dict(doc.metadata)))
+        return chunks
+
+    def _emit(self, text: str, start: int, end: int, spans):
+        # Same as str.strip() on the chunk, done on the offsets
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+
+    def _split(self, text: str, start: int, end: int, separators, length, spans):
+        separator = separators[-1]
+        finer = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                finer = separators[i + 1:]
+                break
+
+        # Sliding window of (start, end, length) pieces that are small enough to merge
+        window = deque()
+        total = 0
+        for piece_start, piece_end in _pieces(text, start, end, separator):
+            piece_len = length(piece_start, piece_end)
+            if piece_len >= self.chunk_size:
+                if window:
+                    self._emit(text, window[0][0], window[-1][1], spans)
+                    window.clear()
+                    total = 0
+                if finer:
+                    self._split(text, piece_start, piece_end, finer, length, spans)
+                else:
+                    spans.append((piece_start, piece_end))
+                continue
+
+            if total + piece_len > self.chunk_size and window:
+                self._emit(text, window[0][0], window[-1][1], spans)
+                while total > self.chunk_overlap or (total + piece_len > self.chunk_size and total > 0):
+                    total -= window.popleft()[2]
+            window.append((piece_start, piece_end, piece_len))
+            total += piece_len
+
+        if window:
+            self._emit(text, window[0][0], window[-1][1], spans)
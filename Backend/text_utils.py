@@ -0,0 +1,5 @@
+def estimate_tokens(text: str):
+    """
+    Cheap token estimate (about four characters per token for English text).
+    """
+    return len(text) // 4 + 1
@@ -0,0 +1,201 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+
+import boto3
+from botocore.exceptions import ClientError
+
+# Bucket that holds one folder (prefix) per topic index
+S3_BUCKET = os.getenv("S3_BUCKET_NAME", "cmpe-295-team-101")
+
+# Topic layout in S3:
+#   <topic>/manifest.json               points at the current version
+#   <topic>/v00001-1a2b3c4d/index.faiss one folder per publish attempt
+# Topics uploaded before versioning keep index.faiss/index.pkl directly under <topic>/ and
+# have no manifest. Publishing writes the new version under a prefix no other publish
+# uses, then swaps the manifest with a conditional put, so readers always see a complete
+# index and concurrent publishers cannot overwrite each other's files or manifest.
+MANIFEST_NAME = "manifest.json"
+
+# Version folder of a key below the topic prefix ("v00001/" or "v00001-1a2b3c4d/")
+_VERSION_DIR = re.compile(r"v(\d+)(?:-[0-9a-f]+)?/")
+
+
+class TopicVersionConflict(Exception):
+    pass
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Return a process-wide S3 client. boto3 clients are thread-safe, so one is enough.
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = boto3.client("s3")
+    return _s3_client
+
+
+def list_topic_objects(s3, topic_name: str):
+    """
+    List every object stored under the topic prefix.
+    """
+    objects = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=f"{topic_name}/"):
+        objects.extend(page.get("Contents", []))
+    return objects
+
+
+def topic_version(objects):
+    """
+    Build a version string for a topic from the ETag and LastModified of its objects.
+    Any re-upload of index.faiss or index.pkl changes the result.
+    """
+    digest = hashlib.sha256()
+    for obj in sorted(objects, key=lambda o: o["Key"]):
+        digest.update(obj["Key"].encode())
+        digest.update(str(obj.get("ETag", "")).encode())
+        digest.update(str(obj.get("LastModified", "")).encode())
+    return digest.hexdigest()[:16]
+
+
+def download_topic_index(s3, topic_name: str, objects, local_dir: str):
+    """
+    Download the listed topic objects into local_dir, keeping only their file names.
+    """
+    if not objects:
+        raise FileNotFoundError(f"No FAISS index found at S3 prefix {topic_name}/")
+    os.makedirs(local_dir, exist_ok=True)
+    for obj in objects:
+        s3_key = obj["Key"]
+        file_name = s3_key.split("/")[-1]
+        if not file_name:
+            continue
+        local_file_path = os.path.join(local_dir, file_name)
+        logging.info(f"Downloading {s3_key} to {local_file_path}.")
+        s3.download_file(S3_BUCKET, s3_key, local_file_path)
+
+
+def read_manifest(s3, topic_name: str):
+    """
+    Return the topic manifest, or None for legacy (unversioned) or missing topics.
+    """
+    return read_manifest_entry(s3, topic_name)[0]
+
+
+def read_manifest_entry(s3, topic_name: str):
+    """
+    Return (manifest, ETag) of the topic manifest, or (None, None) when there is none.
+    """
+    try:
+        response = s3.get_object(Bucket=S3_BUCKET, Key=f"{topic_name}/{MANIFEST_NAME}")
+    except s3.exceptions.NoSuchKey:
+        return None, None
+    return json.loads(response["Body"].read()), response["ETag"]
+
+
+def resolve_topic_index(s3, topic_name: str):
+    """
+    Find the objects of the current index of a topic.
+    Returns (version, objects, manifest_etag); objects is empty when the topic does not
+    exist and manifest_etag is None for legacy topics. Pass manifest_etag to
+    publish_topic_index to publish an update based on this version.
+    """
+    objects = list_topic_objects(s3, topic_name)
+    manifest_key = f"{topic_name}/{MANIFEST_NAME}"
+    manifest, etag = (None, None)
+    if any(o["Key"] == manifest_key for o in objects):
+        manifest, etag = read_manifest_entry(s3, topic_name)
+    if manifest is None:
+        # Legacy layout: index files directly under the topic prefix
+        root_objects = [o for o in objects if "/" not in o["Key"][len(topic_name) + 1:]]
+        return topic_version(root_objects), root_objects, None
+
+    prefix = manifest["prefix"]
+    # Every manifest names a unique prefix, so its ETag identifies the version
+    version = topic_version([{"Key": manifest_key, "ETag": etag}])
+    return version, [o for o in objects if o["Key"].startswith(prefix)], etag
+
+
+def _delete_objects(s3, keys):
+    for start in range(0, len(keys), 1000):
+        s3.delete_objects(Bucket=S3_BUCKET, Delete={'Objects': [{"Key": key} for key in keys[start:start + 1000]]})
+
+
+def publish_topic_index(s3, topic_name: str, local_dir: str, extra_manifest=None, progress=None, base_etag=None):
+    """
+    Upload every file in local_dir as a new version of the topic and point the manifest at it.
+
+    The manifest is only replaced if it is still the one with ETag `base_etag` (the
+    version the upload was built from, None for a topic without a manifest). Otherwise
+    the upload is deleted and TopicVersionConflict is raised. Versions older than the
+    previous one are deleted afterwards. Returns the new manifest.
+    `progress`, when given, is called with the number of bytes sent by each transfer step.
+    """
+    manifest_key = f"{topic_name}/{MANIFEST_NAME}"
+    manifest, etag = read_manifest_entry(s3, topic_name)
+    if etag != base_etag:
+        raise TopicVersionConflict(f"Topic '{topic_name}' was published by another request; retry.")
+    previous_version = manifest["version"] if manifest else 0
+    version = previous_version + 1
+    prefix = f"{topic_name}/v{version:05d}-{uuid.uuid4().hex[:8]}/"
+
+    uploaded_bytes = 0
+    file_names = sorted(os.listdir(local_dir))
+    for file_name in file_names:
+        local_path = os.path.join(local_dir, file_name)
+        s3.upload_file(local_path, S3_BUCKET, prefix + file_name, ExtraArgs={'ContentType': 'application/octet-stream'}, Callback=progress)
+        uploaded_bytes += os.path.getsize(local_path)
+
+    new_manifest = {
+        "version": version,
+        "prefix": prefix,
+        "files": file_names,
+        "published_at": datetime.datetime.utcnow().isoformat(),
+        **(extra_manifest or {}),
+    }
+    condition = {"IfMatch": base_etag} if base_etag else {"IfNoneMatch": "*"}
+    try:
+        s3.put_object(
+            Bucket=S3_BUCKET,
+            Key=manifest_key,
+            Body=json.dumps(new_manifest).encode(),
+            ContentType="application/json",
+            **condition,
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("PreconditionFailed", "ConditionalRequestConflict"):
+            raise
+        _delete_objects(s3, [prefix + file_name for file_name in file_names])
+        raise TopicVersionConflict(f"Topic '{topic_name}' was published by another request; retry.")
+
+    # Keep the previous version for readers that are still downloading it. Folders of
+    # this or later versions may belong to publishes still in flight, so only older
+    # versions and legacy root files are removed.
+    stale = []
+    for o in list_topic_objects(s3, topic_name):
+        key = o["Key"]
+        if key == manifest_key:
+            continue
+        relative_key = key[len(topic_name) + 1:]
+        version_dir = _VERSION_DIR.match(relative_key)
+        if version_dir is None:
+            if "/" not in relative_key:
+                stale.append(key)
+        elif int(version_dir.group(1)) < previous_version:
+            stale.append(key)
+    _delete_objects(s3, stale)
+
+    logging.info(f"Published version {version} of topic '{topic_name}' ({uploaded_bytes} bytes)")
+    new_manifest["uploaded_bytes"] = uploaded_bytes
+    return new_manifest
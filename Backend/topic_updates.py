@@ -0,0 +1,73 @@
+import hashlib
+import logging
+import os
+
+from ann_index import read_index_meta
+from chunk_store import load_topic_store, save_topic_store
+from topic_store import download_topic_index, get_s3_client, publish_topic_index, resolve_topic_index
+from workspace import job_workspace, topic_workspace
+
+
+def chunk_content_hash(text: str):
+    """
+    Content hash stored in every chunk's metadata, used to skip chunks a topic already has.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _existing_hashes(faiss_index):
+    hashes = set()
+    for doc in faiss_index.docstore._dict.values():
+        hashes.add(doc.metadata.get("content_hash") or chunk_content_hash(doc.page_content))
+    return hashes
+
+
+def append_documents_to_topic(topic_name: str, chunked_docs, job_id: str):
+    """
+    Add new chunks to an existing topic index and publish the result as a new version.
+
+    Only chunks whose content hash is not already in the topic are embedded, so re-uploaded
+    pages cost nothing. Returns a summary with the published version and chunk counts.
+    """
+    s3 = get_s3_client()
+    version, objects, manifest_etag = resolve_topic_index(s3, topic_name)
+    if not objects:
+        raise FileNotFoundError(f"No FAISS index found at S3 prefix {topic_name}/")
+
+    populate = lambda tmp_dir: download_topic_index(s3, topic_name, objects, tmp_dir)
+    with topic_workspace(topic_name, version, populate) as index_dir:
+        # A private copy: the cached index other requests search is never modified in place
+        faiss_index, _ = load_topic_store(index_dir, writable=True)
+        # New chunks go into the existing index structure (IVF centroids are not retrained)
+        index_meta = read_index_meta(index_dir)
+
+    existing = _existing_hashes(faiss_index)
+    new_docs = []
+    skipped = 0
+    for doc in chunked_docs:
+        content_hash = doc.metadata.setdefault("content_hash", chunk_content_hash(doc.page_content))
+        if content_hash in existing:
+            skipped += 1
+            continue
+        existing.add(content_hash)
+        new_docs.append(doc)
+
+    summary = {"topic_name": topic_name, "chunks_added": len(new_docs), "chunks_skipped": skipped}
+    if not new_docs:
+        logging.info(f"No new chunks for topic '{topic_name}'; nothing published.")
+        summary["version"] = None
+        return summary
+
+    faiss_index.add_documents(new_docs)
+    with job_workspace(f"{job_id}-publish") as work_dir:
+        out_dir = os.path.join(work_dir, "index")
+        save_topic_store(faiss_index, out_dir, index_meta)
+        # Fails with TopicVersionConflict if another publish replaced the version read above
+        manifest = publish_topic_index(
+            s3, topic_name, out_dir, {"chunks": faiss_index.index.ntotal}, base_etag=manifest_etag,
+        )
+
+    logging.info(f"Appended {len(new_docs)} chunks to topic '{topic_name}' (skipped {skipped} already present)")
+    summary["version"] = manifest["version"]
+    summary["chunks"] = faiss_index.index.ntotal
+    return summary
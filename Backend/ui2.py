@@ -4,10 +4,13 @@ import json
 from datetime import datetime, timedelta
 import functools
 import os
+import time
 
 st.set_page_config(page_title="Document to VectorDB and Quiz Generation", layout="wide")
 
 CACHE_EXPIRY = timedelta(minutes=5)
+# Longest time to wait for an upload job before reporting it as failed
+INGEST_JOB_TIMEOUT = timedelta(minutes=30)
 _cache_time = None
 _cached_topics = None
 
@@ -29,6 +32,37 @@ def fetch_s3_topics():
         st.error(f"Failed to fetch topics: {str(e)}")
         return []
 
+def wait_for_ingest_job(job_id, poll_seconds=1.0):
+    """
+    Poll /jobs/{job_id} and show stage progress until the job is done or failed, or
+    INGEST_JOB_TIMEOUT has passed.
+    """
+    deadline = datetime.now() + INGEST_JOB_TIMEOUT
+    status_text = st.empty()
+    progress_bar = st.progress(0.0)
+    while True:
+        job = requests.get(f"http://localhost:8000/jobs/{job_id}", timeout=30).json()
+        progress = job["progress"]
+        if job["status"] == "extracting" and progress["pages_total"]:
+            fraction = progress["pages_extracted"] / progress["pages_total"]
+            status_text.write(f"Extracting text: {progress['pages_extracted']}/{progress['pages_total']} pages")
+        elif job["status"] == "embedding" and progress["chunks_total"]:
+            fraction = progress["chunks_embedded"] / progress["chunks_total"]
+            status_text.write(f"Embedding: {progress['chunks_embedded']}/{progress['chunks_total']} chunks")
+        elif job["status"] == "uploading" and progress["bytes_total"]:
+            fraction = progress["bytes_uploaded"] / progress["bytes_total"]
+            status_text.write(f"Uploading to S3: {progress['bytes_uploaded'] / 1e6:.1f}/{progress['bytes_total'] / 1e6:.1f} MB")
+        else:
+            fraction = 1.0 if job["status"] == "done" else 0.0
+            status_text.write(f"Job {job['status']}")
+        progress_bar.progress(min(fraction, 1.0))
+        if job["status"] in ("done", "failed"):
+            return job
+        if datetime.now() > deadline:
+            minutes = int(INGEST_JOB_TIMEOUT.total_seconds() // 60)
+            return {**job, "status": "failed", "error": f"No result after {minutes} minutes (job {job_id} is still {job['status']})"}
+        time.sleep(poll_seconds)
+
 def main():
     tabs = st.tabs(["VectorDB Management", "Quiz Generation", "Quiz Management", "All Quizzes", "Update Quiz Answers"])
 
@@ -54,26 +88,22 @@ def main():
                             for file in uploaded_files
                         ]
 
+                        # The backend queues an ingest job that also publishes the index to S3
                         response = requests.post(
                             "http://localhost:8000/upload-documents",
                             files=files,
+                            data={"s3_folder_name": s3_folder_name},
                             timeout=180
                         )
 
-                        if response.status_code == 200:
-                            st.success("PDF files successfully processed and FAISS index created.")
-                            
-                            upload_response = requests.post(
-                                "http://localhost:8000/upload-faiss-to-s3",
-                                json={"s3_folder_name": s3_folder_name},
-                                timeout=60
-                            )
-                            if upload_response.status_code == 200:
-                                st.success(f"FAISS index successfully uploaded to s3://cmpe-280/{s3_folder_name}")
+                        if response.status_code == 202:
+                            job = wait_for_ingest_job(response.json()["job_id"])
+                            if job["status"] == "done":
+                                st.success(f"FAISS index created and uploaded to s3://cmpe-280/{s3_folder_name}")
                             else:
-                                st.error(f"Error during upload to S3: {upload_response.json().get('message', 'Unknown error')}")
+                                st.error(f"Error during FAISS creation: {job.get('error') or 'Unknown error'}")
                         else:
-                            st.error(f"Error during FAISS creation: {response.json().get('message', 'Unknown error')}")
+                            st.error(f"Error during upload: {response.json().get('detail', 'Unknown error')}")
 
                     except requests.exceptions.ConnectionError:
                         st.error("Failed to connect to the backend. Please ensure the FastAPI server is running.")
@@ -0,0 +1,164 @@
+import hashlib
+import os
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Size of the pieces the request body is fed to the parser and written to disk in
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# Per-file and per-request upload limits
+MAX_UPLOAD_FILE_MB = int(os.getenv("MAX_UPLOAD_FILE_MB", "100"))
+MAX_UPLOAD_REQUEST_MB = int(os.getenv("MAX_UPLOAD_REQUEST_MB", "500"))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadFormatError(Exception):
+    pass
+
+
+class StreamedFile:
+    def __init__(self, filename, path):
+        self.filename = filename
+        self.path = path
+        self.size = 0
+        self.sha256 = None
+
+    def describe(self):
+        return {"filename": self.filename, "size": self.size, "sha256": self.sha256}
+
+
+class MultipartUploadStream:
+    """
+    Parse a multipart/form-data request body as it arrives, writing every file part
+    straight to `dest_dir` in UPLOAD_CHUNK_BYTES pieces and hashing it on the fly.
+
+    Iterate `files()` to receive each file as soon as its last byte is on disk.
+    Plain form fields are collected in `fields`.
+    """
+
+    def __init__(self, request, dest_dir: str,
+                 max_file_bytes=MAX_UPLOAD_FILE_MB * 1024 * 1024,
+                 max_request_bytes=MAX_UPLOAD_REQUEST_MB * 1024 * 1024):
+        self.request = request
+        self.dest_dir = dest_dir
+        self.max_file_bytes = max_file_bytes
+        self.max_request_bytes = max_request_bytes
+        self.fields = {}
+        self.total_bytes = 0
+
+        self._completed = []
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._field_name = None
+        self._field_value = None
+        self._current = None
+        self._handle = None
+        self._digest = None
+
+    def _check_request(self):
+        content_type, params = parse_options_header(self.request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UploadFormatError("Expected a multipart/form-data upload.")
+        content_length = self.request.headers.get("content-length")
+        # Reject oversized requests before reading a single byte of the body
+        if content_length and int(content_length) > self.max_request_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {self.max_request_bytes // (1024 * 1024)} MB request limit.")
+        return params[b"boundary"]
+
+    # Parser callbacks
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._field_name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._field_value = bytearray()
+            return
+        filename = os.path.basename(filename.decode("utf-8", "replace")) or "upload.pdf"
+        self._current = StreamedFile(filename, os.path.join(self.dest_dir, f"{len(self._completed)}-{filename}"))
+        self._handle = open(self._current.path, "wb", buffering=UPLOAD_CHUNK_BYTES)
+        self._digest = hashlib.sha256()
+
+    def _on_part_data(self, data, start, end):
+        chunk = data[start:end]
+        if self._current is None:
+            self._field_value.extend(chunk)
+            return
+        self._current.size += len(chunk)
+        if self._current.size > self.max_file_bytes:
+            raise UploadTooLarge(
+                f"{self._current.filename} exceeds the {self.max_file_bytes // (1024 * 1024)} MB per-file limit."
+            )
+        self._digest.update(chunk)
+        self._handle.write(chunk)
+
+    def _on_part_end(self):
+        if self._current is None:
+            self.fields[self._field_name] = self._field_value.decode("utf-8", "replace")
+            self._field_value = None
+            return
+        self._handle.close()
+        self._current.sha256 = self._digest.hexdigest()
+        self._completed.append(self._current)
+        self._current = None
+        self._handle = None
+
+    async def files(self):
+        """
+        Yield each uploaded file (a StreamedFile) as soon as it has been fully written.
+        """
+        boundary = self._check_request()
+        callbacks = {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        }
+        parser = MultipartParser(boundary, callbacks)
+        yielded = 0
+        try:
+            async for body in self.request.stream():
+                for offset in range(0, len(body), UPLOAD_CHUNK_BYTES):
+                    piece = body[offset:offset + UPLOAD_CHUNK_BYTES]
+                    self.total_bytes += len(piece)
+                    if self.total_bytes > self.max_request_bytes:
+                        raise UploadTooLarge(
+                            f"Upload exceeds the {self.max_request_bytes // (1024 * 1024)} MB request limit."
+                        )
+                    parser.write(piece)
+                while yielded < len(self._completed):
+                    yield self._completed[yielded]
+                    yielded += 1
+            parser.finalize()
+            while yielded < len(self._completed):
+                yield self._completed[yielded]
+                yielded += 1
+        finally:
+            if self._handle is not None:
+                self._handle.close()
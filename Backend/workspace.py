@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: reference changes are only serialized within one process
+    fcntl = None
+
+# Root for all per-job and per-topic scratch directories. Every uvicorn worker on the
+# host shares it, so nothing in here may be written in place: directories are filled
+# under a temporary name and renamed into their final, content-addressed name.
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", "workspaces")
+
+JOBS_DIR = os.path.join(WORKSPACE_ROOT, "jobs")
+BUILDS_DIR = os.path.join(WORKSPACE_ROOT, "builds")
+TOPICS_DIR = os.path.join(WORKSPACE_ROOT, "topics")
+TMP_DIR = os.path.join(WORKSPACE_ROOT, "tmp")
+
+# Job ids are uuid4 hex strings; anything else must never reach a filesystem path
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def is_job_id(value):
+    return isinstance(value, str) and _JOB_ID.fullmatch(value) is not None
+
+
+def _tmp_path(name):
+    os.makedirs(TMP_DIR, exist_ok=True)
+    return os.path.join(TMP_DIR, f"{name}-{uuid.uuid4().hex}")
+
+
+@contextmanager
+def atomic_dir(final_dir: str):
+    """
+    Yield a private temporary directory and rename it to final_dir on success.
+
+    If another worker published final_dir first, our copy is discarded and theirs is kept.
+    On error the temporary directory is removed and final_dir is left untouched.
+    """
+    tmp_dir = _tmp_path(os.path.basename(final_dir))
+    os.makedirs(tmp_dir)
+    try:
+        yield tmp_dir
+        os.makedirs(os.path.dirname(final_dir), exist_ok=True)
+        try:
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            if not os.path.isdir(final_dir):
+                raise
+            logging.info(f"{final_dir} was already published by another worker.")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def job_dir(job_id: str):
+    """
+    Scratch directory of one request or job. Queued jobs keep their uploads here until
+    the ingest worker picks them up.
+    """
+    path = os.path.join(JOBS_DIR, job_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@contextmanager
+def job_workspace(job_id: str):
+    """
+    Private scratch directory for one request or job, removed when the block exits.
+    """
+    path = job_dir(job_id)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def build_dir(job_id: str):
+    """
+    Location of the finished FAISS index built by an upload job. Raises ValueError for
+    anything that is not a job id or would resolve outside BUILDS_DIR.
+    """
+    if not is_job_id(job_id):
+        raise ValueError(f"Invalid job id: {job_id!r}")
+    path = os.path.join(BUILDS_DIR, job_id)
+    builds_root = os.path.realpath(BUILDS_DIR)
+    if os.path.commonpath([builds_root, os.path.realpath(path)]) != builds_root:
+        raise ValueError(f"Build directory of job {job_id} is outside {BUILDS_DIR}")
+    return path
+
+
+def topic_dir(topic_name: str, version: str):
+    """
+    Content-addressed directory for one version of a topic index.
+    """
+    topic_hash = hashlib.sha256(topic_name.encode()).hexdigest()[:16]
+    return os.path.join(TOPICS_DIR, topic_hash, version)
+
+
+# Reference counting: each holder of a directory owns one marker file in "<dir>.refs/".
+# Markers carry the owner's pid so markers left behind by a crashed worker are ignored.
+# Taking a reference and removing an unreferenced directory both hold an exclusive lock
+# on a file next to the directory, so no reference can appear between the count and the
+# delete. The lock file is never deleted, so every process always locks the same file.
+
+def _refs_dir(path):
+    return path.rstrip("/\\") + ".refs"
+
+
+@contextmanager
+def _refs_lock(path):
+    parent = os.path.dirname(path.rstrip("/\\"))
+    os.makedirs(parent, exist_ok=True)
+    with open(os.path.join(parent, ".refs.lock"), "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def acquire(path: str):
+    """
+    Register a reference to path and return a token for release().
+    """
+    refs = _refs_dir(path)
+    token = f"{os.getpid()}-{uuid.uuid4().hex}"
+    with _refs_lock(path):
+        os.makedirs(refs, exist_ok=True)
+        open(os.path.join(refs, token), "w").close()
+    return token
+
+
+def release(path: str, token: str):
+    try:
+        os.remove(os.path.join(_refs_dir(path), token))
+    except FileNotFoundError:
+        pass
+
+
+def ref_count(path: str):
+    refs = _refs_dir(path)
+    if not os.path.isdir(refs):
+        return 0
+    count = 0
+    for token in os.listdir(refs):
+        try:
+            pid = int(token.split("-", 1)[0])
+        except ValueError:
+            continue
+        if _pid_alive(pid):
+            count += 1
+        else:
+            release(path, token)
+    return count
+
+
+def remove_if_unreferenced(path: str):
+    """
+    Delete path (and its reference markers) when nobody holds a reference to it.
+    """
+    with _refs_lock(path):
+        if ref_count(path) > 0:
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        shutil.rmtree(_refs_dir(path), ignore_errors=True)
+    return True
+
+
+@contextmanager
+def referenced(path: str):
+    token = acquire(path)
+    try:
+        yield path
+    finally:
+        release(path, token)
+
+
+@contextmanager
+def topic_workspace(topic_name: str, version: str, populate):
+    """
+    Yield the local directory holding `version` of a topic index, calling
+    populate(tmp_dir) to download it only if no worker has published it yet.
+
+    Older versions of the same topic are removed once nobody references them.
+    """
+    path = topic_dir(topic_name, version)
+    token = acquire(path)
+    try:
+        if not os.path.isdir(path):
+            with atomic_dir(path) as tmp_dir:
+                populate(tmp_dir)
+        yield path
+    finally:
+        release(path, token)
+        parent = os.path.dirname(path)
+        for other in os.listdir(parent) if os.path.isdir(parent) else []:
+            other_path = os.path.join(parent, other)
+            if other_path != path and not other.endswith(".refs") and os.path.isdir(other_path):
+                remove_if_unreferenced(other_path)
@@ -51,6 +51,9 @@ const topicsData = [
 
 const questionTypes = ["Multiple Choice", "True/False", "Short Answer", "Long Answer"];
 
+// Longest time to wait for an upload job before reporting it as failed
+const INGEST_JOB_TIMEOUT_MS = 30 * 60 * 1000;
+
 const rotateAnimation = keyframes`
   from {
     transform: rotate(0deg);
@@ -95,6 +98,7 @@ const BrowseTopics = () => {
   });
   const [isDragging, setIsDragging] = useState(false);
   const [loading, setLoading] = useState(false);
+  const [ingestProgress, setIngestProgress] = useState("");
   const fileInputRef = useRef(null);
   const navigate = useNavigate();
   const location = useLocation(); // Get the location object
@@ -364,6 +368,35 @@ const BrowseTopics = () => {
     });
   };
 
+  // Poll an ingest job until it finishes, showing its current stage in the loader
+  const waitForIngestJob = async (baseURL, jobId) => {
+    const deadline = Date.now() + INGEST_JOB_TIMEOUT_MS;
+    while (true) {
+      const { data: job } = await axios.get(`${baseURL}/api/jobs/${jobId}`);
+      const progress = job.progress;
+      if (job.status === "extracting") {
+        setIngestProgress(`Extracting text: ${progress.pages_extracted}/${progress.pages_total} pages`);
+      } else if (job.status === "embedding") {
+        setIngestProgress(`Embedding: ${progress.chunks_embedded}/${progress.chunks_total} chunks`);
+      } else if (job.status === "uploading") {
+        setIngestProgress(`Uploading to S3: ${(progress.bytes_uploaded / 1e6).toFixed(1)}/${(progress.bytes_total / 1e6).toFixed(1)} MB`);
+      } else {
+        setIngestProgress(`Job ${job.status}`);
+      }
+      if (job.status === "done" || job.status === "failed") {
+        return job;
+      }
+      if (Date.now() > deadline) {
+        return {
+          ...job,
+          status: "failed",
+          error: `No result after ${INGEST_JOB_TIMEOUT_MS / 60000} minutes (job ${jobId} is still ${job.status})`,
+        };
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
   const handleCreateNewTopic = async () => {
     // Validate inputs
     if (!newTopicData.name || !newTopicData.description) {
@@ -380,75 +413,53 @@ const BrowseTopics = () => {
     newTopicData.files.forEach((file) => {
       formData.append("files", file);
     });
+    // The ingest job publishes the finished index straight to this S3 folder
+    formData.append("s3_folder_name", newTopicData.name);
   
     setLoading(true);
   
     try {
-      // Step 1: Upload documents and create FAISS index
+      // Step 1: Upload documents; the backend queues a job that builds the FAISS index
       const baseURL = process.env.REACT_APP_API_URL || "http://localhost:8000";
-      // const response = await axios.post(`${baseURL}/update_answers`, answerData);
-      const faissResponse = await axios.post(`${baseURL}/api/upload-documents`, formData, {
+      const uploadResponse = await axios.post(`${baseURL}/api/upload-documents`, formData, {
         headers: {
           "Content-Type": "multipart/form-data",
         },
       });
   
-      if (faissResponse.status === 200) {
+      // Step 2: Poll the job until the index is built and uploaded to S3
+      const job = await waitForIngestJob(baseURL, uploadResponse.data.job_id);
+  
+      if (job.status === "done") {
         setNotification({
           open: true,
-          message: "FAISS index created successfully!",
+          message: `FAISS index uploaded successfully to s3://cmpe-295/${newTopicData.name}`,
           severity: "success",
         });
   
-        // Step 2: Upload FAISS index to S3
-        const baseURL = process.env.REACT_APP_API_URL || "http://localhost:8000";
-        const s3Response = await axios.post(
-          `${baseURL}/api/upload-faiss-to-s3`,
-          { s3_folder_name: newTopicData.name },
-          {
-            headers: {
-              "Content-Type": "application/json",
-            },
-          }
-        );
-  
-        if (s3Response.status === 200) {
-          setNotification({
-            open: true,
-            message: `FAISS index uploaded successfully to s3://cmpe-295/${newTopicData.name}`,
-            severity: "success",
-          });
-  
-          // Add the new topic to the topics list
-          const newTopic = {
-            id: topics.length + 1,
-            name: newTopicData.name,
-            description: newTopicData.description,
-            isFavorite: newTopicData.isFavorite,
-            files: newTopicData.files,
-          };
-          setTopics([...topics, newTopic]);
-  
-          // Reset newTopicData
-          setNewTopicData({
-            name: "",
-            description: "",
-            isFavorite: false,
-            files: [],
-          });
+        // Add the new topic to the topics list
+        const newTopic = {
+          id: topics.length + 1,
+          name: newTopicData.name,
+          description: newTopicData.description,
+          isFavorite: newTopicData.isFavorite,
+          files: newTopicData.files,
+        };
+        setTopics([...topics, newTopic]);
+  
+        // Reset newTopicData
+        setNewTopicData({
+          name: "",
+          description: "",
+          isFavorite: false,
+          files: [],
+        });
   
-          setIsDrawerOpen(false);
-        } else {
-          setNotification({
-            open: true,
-            message: `Error uploading to S3: ${s3Response.data.message}`,
-            severity: "error",
-          });
-        }
+        setIsDrawerOpen(false);
       } else {
         setNotification({
           open: true,
-          message: `Error creating FAISS index: ${faissResponse.data.message}`,
+          message: `Error creating FAISS index: ${job.error}`,
           severity: "error",
         });
       }
@@ -456,11 +467,12 @@ const BrowseTopics = () => {
       console.error("Error during topic creation:", error);
       setNotification({
         open: true,
-        message: "An unexpected error occurred. Please try again.",
+        message: error.response?.data?.detail || "An unexpected error occurred. Please try again.",
         severity: "error",
       });
     } finally {
       setLoading(false);
+      setIngestProgress("");
     }
   };
   
@@ -874,7 +886,7 @@ const BrowseTopics = () => {
             Creating quiz...
           </Typography>
           <Typography variant="body1">
-            This may take a few seconds.
+            {ingestProgress || "This may take a few seconds."}
           </Typography>
         </Box>
       )}
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useRef } from "react";
+import React, { useState, useEffect } from "react";
 import { useLocation, useNavigate } from "react-router-dom";
 import {
   Box,
@@ -117,38 +117,42 @@ const QuizPage = () => {
         your_answers: answersList,
       });
   
-      // Grade open-ended questions in parallel
-      const gradingPromises = quiz.questions.map((q, i) => {
-        const userAnswer = answers[i];
-        if (
-          (q.type === "short_answer" || q.type === "long_answer") &&
-          userAnswer &&
-          userAnswer !== "Not Answered"
-        ) {
-          return axios
-            .post(`${baseURL}/api/grade-open-answer`, {
-              question: q.question,
-              expected_answer: q.answer,
-              user_answer: userAnswer,
-              answer_type: q.type,
-            })
-            .then((res) => ({ index: i, score: res.data.score, feedback: res.data.feedback }))
+      // Grade open-ended questions with one batched request
+      const openIndexes = quiz.questions
+        .map((q, i) => i)
+        .filter((i) => {
+          const q = quiz.questions[i];
+          const userAnswer = answers[i];
+          return (
+            (q.type === "short_answer" || q.type === "long_answer") &&
+            userAnswer &&
+            userAnswer !== "Not Answered"
+          );
+        });
+      const graded = openIndexes.length
+        ? await axios
+            .post(
+              `${baseURL}/api/grade-open-answers`,
+              openIndexes.map((i) => ({
+                question: quiz.questions[i].question,
+                expected_answer: quiz.questions[i].answer,
+                user_answer: answers[i],
+                answer_type: quiz.questions[i].type,
+              }))
+            )
+            .then((res) =>
+              res.data.results.map((r, j) => ({ index: openIndexes[j], score: r.score, feedback: r.feedback }))
+            )
             .catch((err) => {
-              console.error(`Grading failed for Q${i + 1}:`, err);
-              return null;
-            });
-        }
-        return null;
-      });
-  
-      // const gradingResponses = await Promise.all(gradingPromises);
-  
-      // const gradingResultsTemp = {};
-      // gradingResponses.forEach((res) => {
-      //   if (res) gradingResultsTemp[res.index] = { score: res.score, feedback: res.feedback };
-      // });
+              console.error("Grading failed:", err);
+              return [];
+            })
+        : [];
+      setGradingResults((prev) => ({
+        ...prev,
+        ...Object.fromEntries(graded.map(({ index, score, feedback }) => [index, { score, feedback }])),
+      }));
   
-      // setGradingResults(gradingResultsTemp);
       alert("Your answers have been submitted!");
       setShowResults(true);
       setActiveStep(0);
@@ -193,47 +197,12 @@ const QuizPage = () => {
     setActiveStep((prev) => Math.max(prev - 1, 0));
   };
 
-  const debounceTimeouts = useRef({});
-
-const handleAnswerChange = (questionIndex, selectedOption) => {
-  setAnswers((prev) => ({
-    ...prev,
-    [questionIndex]: selectedOption,
-  }));
-
-  const q = quiz.questions[questionIndex];
-
-  // Clear existing debounce
-  if (debounceTimeouts.current[questionIndex]) {
-    clearTimeout(debounceTimeouts.current[questionIndex]);
-  }
-
-  // Only trigger grading for open-ended questions
-  if (!Array.isArray(q.options)) {
-    debounceTimeouts.current[questionIndex] = setTimeout(async () => {
-      try {
-        const baseURL = process.env.REACT_APP_API_URL || "http://localhost:8000";
-        const res = await axios.post(`${baseURL}/api/grade-open-answer`, {
-          question: q.question,
-          expected_answer: q.answer,
-          user_answer: selectedOption,
-          answer_type: q.answer.split(" ").length > 20 ? "long_answer" : "short_answer",
-        });
-
-        setGradingResults((prev) => ({
-          ...prev,
-          [questionIndex]: {
-            score: res.data.score,
-            feedback: res.data.feedback,
-          },
-        }));
-      } catch (error) {
-        console.error(`Grading failed for Q${questionIndex + 1}:`, error);
-      }
-    }, 1000); // Wait 1 second after last keystroke
-  }
-};
-  
+  const handleAnswerChange = (questionIndex, selectedOption) => {
+    setAnswers((prev) => ({
+      ...prev,
+      [questionIndex]: selectedOption,
+    }));
+  };
 
   const handleSubmit = () => {
     setShowResults(true);